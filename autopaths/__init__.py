@@ -18,8 +18,32 @@ from autopaths import common
 from autopaths import file_size
 from autopaths import file_permissions
 from autopaths import base_path
+from autopaths import line_count
+from autopaths import checksums
+from autopaths import parallel_gzip
+from autopaths import gzip_index
+from autopaths import file_edit
+from autopaths import fast_copy
+from autopaths import line_view
+from autopaths import file_shards
+from autopaths import sniff
+from autopaths import compressed_io
+from autopaths import compression
+from autopaths import archive_builder
+from autopaths import archive_extract
+from autopaths import archive_members
+from autopaths import bulk_ops
+from autopaths import dir_walk
+from autopaths import path_glob
+from autopaths import disk_usage
+from autopaths import dir_index
+from autopaths import dir_snapshot
+from autopaths import dir_watch
+from autopaths import duplicates
+from autopaths import dir_prune
 from autopaths import file_path
 from autopaths import dir_path
+from autopaths import aio
 from autopaths import tmp_path
 from autopaths import auto_paths
 
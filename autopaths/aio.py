@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+
+Awaitable versions of the `FilePath` and `DirectoryPath` methods, for
+programs built on `asyncio`. Every blocking call runs on a shared thread
+pool. The number of operations submitted at the same time is bounded, so
+that a single event loop can start thousands of them: the extra ones
+simply wait their turn without piling up in the executor queue.
+
+    >>> from autopaths import aio
+    >>> f = aio.AsyncFilePath('/tmp/reads.fastq')
+    >>> digest = await f.md5()
+    >>> await f.gzip_to()
+    >>> async for item in aio.AsyncDirectoryPath('/tmp/').files(): ...
+
+The same objects are available as `path.aio` on every path.
+"""
+
+# Built-in modules #
+import os, asyncio, weakref, functools, itertools
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+import autopaths
+
+# Constants #
+max_workers = min(32, (os.cpu_count() or 1) * 4)
+max_pending = 1024
+batch_size  = 256
+
+# The shared state #
+executor   = None
+semaphores = weakref.WeakKeyDictionary()
+
+###############################################################################
+def configure(workers=None, pending=None):
+    """
+    Change the number of threads performing the operations, and the
+    number of operations allowed to be in flight at the same time.
+    Operations that were already started finish on the old executor.
+    """
+    global executor, max_workers, max_pending
+    if workers is not None: max_workers = workers
+    if pending is not None: max_pending = pending
+    if executor is not None: executor.shutdown(wait=False)
+    executor = None
+    semaphores.clear()
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=max_workers,
+                                      thread_name_prefix='autopaths')
+    return executor
+
+def get_semaphore():
+    """One semaphore per event loop, since they can't be shared."""
+    loop = asyncio.get_running_loop()
+    if loop not in semaphores:
+        semaphores[loop] = asyncio.Semaphore(max_pending)
+    return semaphores[loop]
+
+async def run(function, *args, **kwargs):
+    """Run a blocking function on the shared executor and await it."""
+    async with get_semaphore():
+        loop = asyncio.get_running_loop()
+        call = functools.partial(function, *args, **kwargs)
+        return await loop.run_in_executor(get_executor(), call)
+
+async def iterate(function, *args, batch_size=batch_size, **kwargs):
+    """
+    Consume a blocking iterator on the executor, in batches, and yield its
+    items asynchronously. `function(*args, **kwargs)` must return the
+    iterator.
+    """
+    iterator = await run(lambda: iter(function(*args, **kwargs)))
+    while True:
+        batch = await run(list, itertools.islice(iterator, batch_size))
+        if not batch: return
+        for item in batch: yield item
+
+###############################################################################
+def awaitable(name):
+    """An async method that calls the method `name` of the wrapped path."""
+    async def method(self, *args, **kwargs):
+        return await run(getattr(self.path, name), *args, **kwargs)
+    method.__name__ = name
+    method.__doc__  = "Awaitable version of `%s`." % name
+    return method
+
+def awaitable_property(name):
+    """An async method that evaluates the property `name` of the path."""
+    async def method(self):
+        return await run(getattr, self.path, name)
+    method.__name__ = name
+    method.__doc__  = "Awaitable version of the `%s` property." % name
+    return method
+
+def async_iterator(name):
+    """An async generator over the property `name` of the wrapped path."""
+    async def method(self, batch_size=batch_size):
+        async for item in iterate(getattr, self.path, name,
+                                  batch_size=batch_size):
+            yield item
+    method.__name__ = name
+    method.__doc__  = "Asynchronous iterator over `%s`." % name
+    return method
+
+###############################################################################
+class AsyncPath(object):
+    """Methods common to files and directories."""
+
+    path_class = None
+
+    def __repr__(self):
+        return '<%s object "%s">' % (self.__class__.__name__, self.path)
+
+    def __str__(self): return str(self.path)
+
+    def __fspath__(self): return str(self.path)
+
+    def __init__(self, path):
+        if not isinstance(path, self.path_class): path = self.path_class(path)
+        self.path = path
+
+    async def stat(self, follow_symlinks=True):
+        return await run(os.stat, str(self.path),
+                         follow_symlinks=follow_symlinks)
+
+    exists     = awaitable_property('exists')
+    is_symlink = awaitable_property('is_symlink')
+    mdate      = awaitable_property('mdate')
+    size       = awaitable_property('size')
+    remove     = awaitable('remove')
+    move_to    = awaitable('move_to')
+    copy       = awaitable('copy')
+    link_to    = awaitable('link_to')
+
+###############################################################################
+class AsyncFilePath(AsyncPath):
+    """Awaitable versions of the main `FilePath` methods."""
+
+    path_class = autopaths.file_path.FilePath
+
+    # Stat #
+    count_bytes = awaitable_property('count_bytes')
+    count       = awaitable_property('count')
+    compression = awaitable_property('compression')
+    # Read #
+    contents    = awaitable_property('contents')
+    first       = awaitable_property('first')
+    lines       = awaitable_property('lines')
+    read        = awaitable('read')
+    sniff       = awaitable('sniff')
+    # Write #
+    write       = awaitable('write')
+    writelines  = awaitable('writelines')
+    append      = awaitable('append')
+    prepend     = awaitable('prepend')
+    touch       = awaitable('touch')
+    concat_from = awaitable('concat_from')
+    # Hash #
+    md5         = awaitable_property('md5')
+    checksums   = awaitable('checksums')
+    # Compression #
+    gzip_to       = awaitable('gzip_to')
+    ungzip_to     = awaitable('ungzip_to')
+    compress_to   = awaitable('compress_to')
+    decompress_to = awaitable('decompress_to')
+    unzip_to      = awaitable('unzip_to')
+    untargz_to    = awaitable('untargz_to')
+
+    async def iter_lines(self, batch_size=batch_size):
+        """Asynchronous iterator over the lines of the file."""
+        async for line in iterate(iter, self.path, batch_size=batch_size):
+            yield line
+
+###############################################################################
+class AsyncDirectoryPath(AsyncPath):
+    """Awaitable versions of the main `DirectoryPath` methods."""
+
+    path_class = autopaths.dir_path.DirectoryPath
+
+    # Create #
+    create           = awaitable('create')
+    create_if_not_exists = awaitable('create_if_not_exists')
+    # Walk #
+    contents         = async_iterator('contents')
+    files            = async_iterator('files')
+    directories      = async_iterator('directories')
+    flat_contents    = async_iterator('flat_contents')
+    flat_files       = async_iterator('flat_files')
+    flat_directories = async_iterator('flat_directories')
+    # Archives #
+    tar_to           = awaitable('tar_to')
+    targz_to         = awaitable('targz_to')
+    zip_to           = awaitable('zip_to')
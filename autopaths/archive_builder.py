@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, fnmatch, tarfile, zipfile
+
+# Internal modules #
+from autopaths.parallel_gzip import ParallelGzipWriter
+
+# Constants #
+compressed_extensions = {'.gz', '.tgz', '.bz2', '.xz', '.zst', '.zip',
+                         '.7z', '.rar', '.bam', '.cram', '.jpg', '.jpeg',
+                         '.png', '.gif', '.webp', '.mp3', '.mp4', '.mkv',
+                         '.pdf', '.parquet'}
+
+###############################################################################
+def is_excluded(relative, exclude):
+    """
+    Check if an entry should be skipped. The `exclude` is either a function
+    taking the relative path, or a list of glob patterns that are matched
+    against both the relative path and the name.
+    """
+    if not exclude: return False
+    if callable(exclude): return exclude(relative)
+    name = os.path.basename(relative)
+    return any(fnmatch.fnmatch(relative, pattern) or
+               fnmatch.fnmatch(name, pattern) for pattern in exclude)
+
+def iter_tree(root, exclude=None, sort=True):
+    """
+    Yield `(relative_path, entry)` for every item below `root`, where
+    `entry` is an `os.DirEntry`. Directories come before their contents.
+    Excluded directories are not descended into. With `sort`, the order
+    is deterministic.
+    """
+    root  = str(root)
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        with os.scandir(os.path.join(root, relative_dir)) as it:
+            entries = list(it)
+        if sort: entries.sort(key=lambda e: e.name)
+        sub_dirs = []
+        for entry in entries:
+            relative = os.path.join(relative_dir, entry.name)
+            if is_excluded(relative, exclude): continue
+            yield relative, entry
+            if entry.is_dir(follow_symlinks=False): sub_dirs.append(relative)
+        # Depth first, in order #
+        stack.extend(reversed(sub_dirs))
+
+def is_compressed(name):
+    """Guess from its extension if a file is already compressed."""
+    return os.path.splitext(name)[1].lower() in compressed_extensions
+
+###############################################################################
+def build_tar(root, destination, compression=None, level=6, workers=None,
+              exclude=None, sort=True, store_compressed=True):
+    """
+    Stream the contents of a directory into a tar archive, without staging
+    anything on disk. Member names are relative to `root`.
+
+    With `compression='gzip'`, the archive is compressed in independent
+    blocks on a pool of `workers` threads. When `store_compressed` is True,
+    members that are already compressed (judging from their extension) are
+    stored in the gzip stream at level zero instead of being recompressed.
+    """
+    # The output #
+    destination = str(destination)
+    itself      = os.path.abspath(destination)
+    if compression == 'gzip':
+        output = ParallelGzipWriter(destination, level, workers=workers)
+    elif compression is None:
+        output = open(destination, 'wb')
+    else:
+        raise Exception("Unrecognized tar compression '%s'." % compression)
+    # Add every entry #
+    with output:
+        with tarfile.open(fileobj=output, mode='w',
+                          format=tarfile.PAX_FORMAT) as tar:
+            for relative, entry in iter_tree(root, exclude, sort):
+                if os.path.abspath(entry.path) == itself: continue
+                info = tar.gettarinfo(entry.path, arcname=relative)
+                if not info.isreg():
+                    tar.addfile(info)
+                    continue
+                store = compression and store_compressed and \
+                        is_compressed(entry.name)
+                if store: output.level = 0
+                with open(entry.path, 'rb') as handle: tar.addfile(info, handle)
+                if store: output.level = level
+    # Return #
+    return destination
+
+def build_zip(root, destination, level=6, exclude=None, sort=True,
+              store_compressed=True):
+    """
+    Stream the contents of a directory into a zip archive. Member names are
+    relative to `root`. Members that are already compressed are stored
+    as they are when `store_compressed` is True.
+    """
+    destination = str(destination)
+    itself      = os.path.abspath(destination)
+    with zipfile.ZipFile(destination, 'w', zipfile.ZIP_DEFLATED,
+                         compresslevel=level) as archive:
+        for relative, entry in iter_tree(root, exclude, sort):
+            if os.path.abspath(entry.path) == itself: continue
+            if store_compressed and is_compressed(entry.name):
+                archive.write(entry.path, relative, zipfile.ZIP_STORED)
+            else:
+                archive.write(entry.path, relative)
+    return destination
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time, shutil, tarfile, zipfile, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+from autopaths.archive_builder import is_excluded
+from autopaths.compressed_io import open_decompressed
+
+# Constants #
+buffer_size = 1 << 20
+
+###############################################################################
+def is_selected(name, select):
+    """
+    Check if an archive member should be extracted. The `select` is either
+    None for everything, a function taking the member name, or a list of
+    glob patterns matched against the name and its last component.
+    """
+    if not select: return True
+    return is_excluded(name.rstrip('/'), select)
+
+def member_path(root, name, resolve=False):
+    """
+    Return the path where an archive member called `name` should be
+    written inside the directory `root`, which must be an absolute, real
+    path. Raises an exception if the member would end up outside of `root`.
+    With `resolve`, symbolic links in the parent directories are followed
+    too, which is needed once the archive has created some links.
+    """
+    if not name or os.path.isabs(name):
+        raise Exception("Unsafe archive member name '%s'." % name)
+    path = os.path.normpath(os.path.join(root, name))
+    if resolve and path != root:
+        parent = os.path.realpath(os.path.dirname(path))
+        path   = os.path.join(parent, os.path.basename(path))
+    if path != root and not path.startswith(root + os.sep):
+        msg = "The archive member '%s' would be extracted outside of '%s'."
+        raise Exception(msg % (name, root))
+    return path
+
+def make_parents(path, created):
+    """Create the parent directory of a path, remembering which exist."""
+    parent = os.path.dirname(path)
+    if parent in created: return
+    os.makedirs(parent, exist_ok=True)
+    created.add(parent)
+
+###############################################################################
+def extract_zip(source, destination, select=None, workers=None,
+                buffer_size=buffer_size):
+    """
+    Extract the members of a zip file to a directory. Every member name is
+    validated before anything is written. Directories are created first,
+    then the files are decompressed concurrently on a pool of `workers`
+    threads, each with its own handle on the zip file.
+    Only members matching `select` are extracted. Returns the destination.
+    """
+    # The destination #
+    destination = os.path.realpath(str(destination))
+    os.makedirs(destination, exist_ok=True)
+    # Validate all members before writing anything #
+    source = str(source)
+    with zipfile.ZipFile(source) as archive: infos = archive.infolist()
+    members = [(info, member_path(destination, info.filename))
+               for info in infos if is_selected(info.filename, select)]
+    # Create the directory structure #
+    created = {destination}
+    for info, path in members:
+        if info.is_dir(): os.makedirs(path, exist_ok=True)
+        else:             make_parents(path, created)
+    # One zip handle per thread #
+    local   = threading.local()
+    handles = []
+    lock    = threading.Lock()
+    def extract(info, path):
+        if not hasattr(local, 'archive'):
+            local.archive = zipfile.ZipFile(source)
+            with lock: handles.append(local.archive)
+        with local.archive.open(info) as in_handle:
+            with open(path, 'wb') as out_handle:
+                shutil.copyfileobj(in_handle, out_handle, buffer_size)
+        mode = (info.external_attr >> 16) & 0o777
+        if mode: os.chmod(path, mode)
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        os.utime(path, (mtime, mtime))
+    # Decompress all files #
+    files = [(info, path) for info, path in members if not info.is_dir()]
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for _ in ex.map(lambda m: extract(*m), files): pass
+    finally:
+        for handle in handles: handle.close()
+    # Return #
+    return destination
+
+def write_member(tar, member, path, buffer_size=buffer_size):
+    """Write a regular file member of a streamed tar to a path."""
+    with open(path, 'wb') as handle:
+        shutil.copyfileobj(tar.extractfile(member), handle, buffer_size)
+    os.chmod(path, member.mode & 0o777)
+    os.utime(path, (member.mtime, member.mtime))
+
+###############################################################################
+def extract_tar(source, destination, select=None, buffer_size=buffer_size):
+    """
+    Extract the members of a tar file to a directory, in a single pass over
+    the archive. A compressed tar (gzip, bz2, xz or zstd) is decompressed
+    in a background thread so that decompression overlaps with the writing
+    of the members. Member names and link targets are validated so that
+    nothing is written outside of the destination. Device files and fifos
+    are skipped. Only members matching `select` are extracted. A selected
+    hard link to a file that was not selected is extracted as a copy of
+    that file, with a second pass over the archive.
+    Returns the destination.
+    """
+    # The destination #
+    destination = os.path.realpath(str(destination))
+    os.makedirs(destination, exist_ok=True)
+    # State #
+    created     = {destination}
+    directories = []
+    links       = False
+    skipped     = set()
+    pending     = {}
+    # Stream the archive #
+    with open_decompressed(str(source), 'rb', buffer_size=buffer_size) as raw:
+        with tarfile.open(fileobj=raw, mode='r|') as tar:
+            for member in tar:
+                if not is_selected(member.name, select):
+                    if member.isreg(): skipped.add(member.name)
+                    continue
+                path = member_path(destination, member.name, links)
+                # Directories get their attributes at the end #
+                if member.isdir():
+                    os.makedirs(path, exist_ok=True)
+                    created.add(path)
+                    directories.append((path, member))
+                    continue
+                make_parents(path, created)
+                if links and os.path.islink(path): os.remove(path)
+                # Regular files #
+                if member.isreg():
+                    write_member(tar, member, path, buffer_size)
+                # Symbolic links must point inside the destination #
+                elif member.issym():
+                    # Resolve from where the link really is, not its name #
+                    parent = os.path.realpath(os.path.dirname(path))
+                    target = os.path.realpath(os.path.join(parent,
+                                                           member.linkname))
+                    if os.path.isabs(member.linkname) or \
+                       (target != destination and
+                        not target.startswith(destination + os.sep)):
+                        msg = "The archive link '%s' points to '%s'."
+                        raise Exception(msg % (member.name, member.linkname))
+                    if os.path.lexists(path): os.remove(path)
+                    os.symlink(member.linkname, path)
+                    links = True
+                # Hard links point to a member already extracted #
+                elif member.islnk():
+                    target = member_path(destination, member.linkname, links)
+                    if os.path.lexists(path): os.remove(path)
+                    # The target was filtered out, copy it in a second pass #
+                    if member.linkname in skipped:
+                        pending.setdefault(member.linkname, []).append(path)
+                        continue
+                    if not os.path.lexists(target):
+                        msg = "The archive link '%s' points to '%s' which" \
+                              " was not extracted."
+                        raise Exception(msg % (member.name, member.linkname))
+                    os.link(target, path)
+    # Hard links to members that were not selected #
+    if pending:
+        with open_decompressed(str(source), 'rb',
+                               buffer_size=buffer_size) as raw:
+            with tarfile.open(fileobj=raw, mode='r|') as tar:
+                for member in tar:
+                    if member.name not in pending: continue
+                    first, *others = pending.pop(member.name)
+                    write_member(tar, member, first, buffer_size)
+                    for path in others: os.link(first, path)
+                    if not pending: break
+    # Directory permissions and times, deepest first #
+    for path, member in reversed(directories):
+        if os.path.islink(path): continue
+        os.chmod(path, member.mode & 0o777 | 0o700)
+        os.utime(path, (member.mtime, member.mtime))
+    # Return #
+    return destination
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, io, time, tarfile, zipfile, collections
+
+# Internal modules #
+from autopaths.archive_extract import is_selected
+from autopaths.compressed_io import ChunkReader, detect_compression
+from autopaths.compressed_io import iter_decompressed, open_decompressed
+from autopaths.gzip_index import GzipIndex
+from autopaths.dir_index import racy_window
+
+# Constants #
+buffer_size = 1 << 20
+
+# The entries of the table of contents #
+MemberInfo = collections.namedtuple('MemberInfo', 'name size offset is_dir')
+
+# The cache #
+cache = {}
+max_cache_entries = 1 << 10
+
+###############################################################################
+def is_zip(path):
+    """Zip files are recognized by their magic number, tar files otherwise."""
+    with open(path, 'rb') as handle: start = handle.read(4)
+    return start in (b'PK\x03\x04', b'PK\x05\x06')
+
+def stamp_of(path):
+    """The key under which the table of contents of a file is cached."""
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def store(stamp, toc):
+    """
+    Cache a table of contents, unless the archive was modified so recently
+    that it could be rewritten with the same size and modification time.
+    """
+    if time.time_ns() - stamp[3] < racy_window: return
+    if len(cache) >= max_cache_entries: cache.clear()
+    cache[stamp] = toc
+
+def zip_info(info):
+    return MemberInfo(info.filename.rstrip('/'), info.file_size,
+                      info.header_offset, info.is_dir())
+
+def tar_info(info):
+    return MemberInfo(info.name, info.size, info.offset_data, info.isdir())
+
+def as_stream(chunks, mode='rb', encoding=None, errors=None):
+    """Wrap an iterator of byte chunks in a buffered file object."""
+    binary = io.BufferedReader(ChunkReader(chunks, threaded=False),
+                               buffer_size)
+    if 'b' in mode: return binary
+    return io.TextIOWrapper(binary, encoding=encoding, errors=errors)
+
+def limit_chunks(chunks, skip, size):
+    """Only yield the `size` bytes that come after the first `skip` bytes."""
+    try:
+        for chunk in chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            chunk = chunk[skip:skip + size]
+            skip  = 0
+            size -= len(chunk)
+            yield chunk
+            if size <= 0: return
+    finally:
+        if hasattr(chunks, 'close'): chunks.close()
+
+def read_file_range(path, offset, size, buffer_size=buffer_size):
+    """Yield the bytes of a range of an uncompressed file in chunks."""
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        while size > 0:
+            chunk = handle.read(min(size, buffer_size))
+            if not chunk: return
+            size -= len(chunk)
+            yield chunk
+
+###############################################################################
+def iter_members(path, select=None, buffer_size=buffer_size):
+    """
+    Yield `(info, handle)` for every member of a zip or tar archive, in the
+    order in which they are stored, where `info` is a `MemberInfo` and
+    `handle` a binary file object streaming the contents of the member
+    (None for directories and links). Compressed tar files are read in a
+    single pass and each handle is only valid until the next member is
+    requested. Only members matching `select` are yielded. When the whole
+    archive was read, its table of contents is cached.
+    """
+    path  = str(path)
+    stamp = stamp_of(path)
+    toc   = []
+    # Zip files #
+    if is_zip(path):
+        with zipfile.ZipFile(path) as archive:
+            for entry in archive.infolist():
+                info = zip_info(entry)
+                toc.append(info)
+                if not is_selected(entry.filename, select): continue
+                if info.is_dir:
+                    yield info, None
+                    continue
+                with archive.open(entry) as handle: yield info, handle
+    # Tar files #
+    else:
+        with open_decompressed(path, 'rb', buffer_size=buffer_size) as raw:
+            with tarfile.open(fileobj=raw, mode='r|') as tar:
+                for entry in tar:
+                    info = tar_info(entry)
+                    toc.append(info)
+                    if not is_selected(entry.name, select): continue
+                    if entry.isreg(): yield info, tar.extractfile(entry)
+                    else:             yield info, None
+    # Store the table of contents #
+    store(stamp, toc)
+
+def table_of_contents(path, use_cache=True):
+    """
+    List the members of a zip or tar archive as `MemberInfo` tuples with
+    the fields `name`, `size`, `offset` and `is_dir`. For tar files the
+    offset is the position of the data in the uncompressed stream.
+    Results are cached per (device, inode, size, mtime_ns), except for
+    archives modified in the last couple of seconds.
+    """
+    path  = str(path)
+    stamp = stamp_of(path)
+    if use_cache and stamp in cache: return cache[stamp]
+    # Zip files only need the central directory #
+    if is_zip(path):
+        with zipfile.ZipFile(path) as archive:
+            toc = [zip_info(entry) for entry in archive.infolist()]
+        store(stamp, toc)
+        return toc
+    # Tar files are scanned once #
+    return [info for info, handle in iter_members(path)]
+
+class MemberChunks(object):
+    """
+    The chunks of one member of a tar archive that is being streamed by
+    `iter_members`. Closing it closes the archive, whether the member was
+    read to the end or not at all.
+    """
+
+    def __init__(self, members, handle, buffer_size=buffer_size):
+        self.members     = members
+        self.handle      = handle
+        self.buffer_size = buffer_size
+
+    def __iter__(self): return self
+
+    def __next__(self):
+        if self.handle is None: raise StopIteration
+        chunk = self.handle.read(self.buffer_size)
+        if not chunk:
+            self.close()
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        self.handle = None
+        self.members.close()
+
+def stream_member(path, name, buffer_size=buffer_size):
+    """
+    Find a member of a tar archive by reading the archive from the start,
+    and return a `MemberChunks` iterator over its contents. Nothing after
+    the member is read.
+    """
+    members = iter_members(path, None, buffer_size)
+    for info, handle in members:
+        if info.name.rstrip('/') == name: break
+    else:
+        raise Exception("No member named '%s' in '%s'." % (name, path))
+    if info.is_dir:
+        members.close()
+        raise Exception("The member '%s' is a directory." % name)
+    return MemberChunks(members, handle, buffer_size)
+
+def open_member(path, name, mode='rb', encoding=None, errors=None,
+                buffer_size=buffer_size):
+    """
+    Open a single member of a zip or tar archive for reading, without
+    extracting anything to disk:
+
+    * Zip members are decompressed directly from their own offset.
+    * When the table of contents of a tar file is cached, members of
+      uncompressed tar files are read directly from their offset, and
+      for gzipped tar files that have a current gzip index on disk (see
+      `FilePath.gzip_index`), decompression starts at the closest access
+      point. Otherwise the stream is decompressed up to the member.
+    * When the table of contents is not cached yet, the archive is read
+      from the start until the member is found and no further.
+    """
+    path = str(path)
+    name = name.rstrip('/')
+    # Tar files that were never scanned #
+    zipped = is_zip(path)
+    if not zipped and stamp_of(path) not in cache:
+        chunks = stream_member(path, name, buffer_size)
+        return as_stream(chunks, mode, encoding, errors)
+    # Find the member #
+    toc  = {info.name: info for info in table_of_contents(path)}
+    if name not in toc:
+        raise Exception("No member named '%s' in '%s'." % (name, path))
+    info = toc[name]
+    if info.is_dir:
+        raise Exception("The member '%s' is a directory." % name)
+    # Zip files #
+    if zipped:
+        archive = zipfile.ZipFile(path)
+        binary  = archive.open(name)
+        archive.close()
+        if 'b' in mode: return binary
+        return io.TextIOWrapper(binary, encoding=encoding, errors=errors)
+    # Tar files #
+    fmt   = detect_compression(path)
+    index = GzipIndex.load(path) if fmt == 'gzip' else None
+    if fmt is None:
+        chunks = read_file_range(path, info.offset, info.size, buffer_size)
+    elif index is not None:
+        chunks = limit_chunks(index.iter_from(info.offset), 0, info.size)
+    else:
+        chunks = iter_decompressed(path, fmt, buffer_size)
+        chunks = limit_chunks(chunks, info.offset, info.size)
+    return as_stream(chunks, mode, encoding, errors)
+
+def top_level_names(path):
+    """The distinct first components of the member names, in order."""
+    names = (info.name.split('/')[0] for info in table_of_contents(path))
+    return list(dict.fromkeys(n for n in names if n not in ('', '.')))
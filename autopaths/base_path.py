@@ -8,7 +8,7 @@ Contact at www.sinclair.bio
 """
 
 # Built-in modules #
-import os, glob
+import os
 
 # Internal modules #
 import autopaths
@@ -40,9 +40,9 @@ class BasePath(str):
         # We will never mix both kinds of separators #
         if os.name == "posix": path = path.replace("\\", sep)
         if os.name == "nt":    path = path.replace("/",  sep)
-        # Expand star #
+        # Expand star, stopping as soon as there are two matches #
         if "*" in path:
-            matches = glob.glob(path)
+            matches = autopaths.path_glob.first_matches(path, 2)
             if len(matches) < 1:
                 raise Exception("Found exactly no paths matching '%s'" % path)
             if len(matches) > 1:
@@ -62,6 +62,17 @@ class BasePath(str):
     def __init__(self, path):
         self.path = self.clean_path(path)
 
+    @classmethod
+    def from_clean(cls, path):
+        """
+        Build a path object from a string that is already in the standard
+        form (e.g. coming from a directory listing), skipping `clean_path`.
+        Directories must already end with a separator.
+        """
+        self = str.__new__(cls, path)
+        self.path = path
+        return self
+
     def __add__(self, other):
         if os.name == "posix": other = other.replace("\\", sep)
         if os.name == "nt":    other = other.replace("/",  sep)
@@ -118,6 +129,16 @@ class BasePath(str):
         """
         return os.path.lexists(self.path)
 
+    @property
+    def aio(self):
+        """
+        Awaitable versions of the main methods, for use with asyncio.
+        For instance `await path.aio.md5()`. See `autopaths.aio`.
+        """
+        if isinstance(self, autopaths.dir_path.DirectoryPath):
+            return autopaths.aio.AsyncDirectoryPath(self)
+        return autopaths.aio.AsyncFilePath(self)
+
     @property
     def is_symlink(self):
         """Is this file a symbolic link to an other file?"""
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, errno, shutil, collections
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+from autopaths.fast_copy import copy_file
+
+# Constants #
+default_workers = min(32, (os.cpu_count() or 1) * 4)
+
+###############################################################################
+class Outcome(collections.namedtuple('Outcome', 'source destination error')):
+    """The result of one item in a bulk operation."""
+
+    @property
+    def ok(self): return self.error is None
+
+def as_str(path):
+    """Paths as plain strings, without the trailing separator of dirs."""
+    if path is None: return None
+    path = str(path)
+    return path.rstrip(os.sep) or path
+
+def make_parent(path):
+    parent = os.path.dirname(path)
+    if parent: os.makedirs(parent, exist_ok=True)
+
+def is_real_dir(path):
+    return os.path.isdir(path) and not os.path.islink(path)
+
+###############################################################################
+def copy_entry(source, destination):
+    """Copy a file, or a symbolic link as a link."""
+    if os.path.islink(source): os.symlink(os.readlink(source), destination)
+    else:                      copy_file(source, destination)
+
+def copy_one(source, destination, workers=1):
+    """Copy a file, a symbolic link or a whole directory."""
+    make_parent(destination)
+    if is_real_dir(source): copy_tree(source, destination, workers)
+    else:                   copy_entry(source, destination)
+
+def move_one(source, destination, overwrite=False):
+    """
+    Move a file or directory. On the same filesystem this is a single
+    rename, across devices the data is copied and the source removed.
+    """
+    make_parent(destination)
+    if os.path.lexists(destination):
+        if not overwrite:
+            raise Exception("The path '%s' already exists." % destination)
+        remove_one(destination)
+    try:
+        os.rename(source, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV: raise
+        copy_one(source, destination)
+        remove_one(source)
+
+def remove_one(path):
+    """Remove a file, a symbolic link or a whole directory."""
+    if is_real_dir(path): shutil.rmtree(path)
+    elif os.path.lexists(path): os.remove(path)
+
+###############################################################################
+def run_bulk(function, items, workers=None, check=False):
+    """
+    Call `function(source, destination)` for every pair of `items` on a
+    pool of threads. Returns a list of `Outcome` tuples in the same order
+    as the items, with the exception raised in `error` if any. With
+    `check`, the first error is raised once every item was processed.
+    """
+    items = [(as_str(s), as_str(d)) for s, d in items]
+    def call(item):
+        try: function(*item)
+        except Exception as error: return Outcome(item[0], item[1], error)
+        return Outcome(item[0], item[1], None)
+    workers = workers or default_workers
+    if len(items) <= 1: results = list(map(call, items))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(call, items))
+    if check:
+        for result in results:
+            if result.error is not None: raise result.error
+    return results
+
+def bulk_copy(pairs, workers=None, check=False):
+    """
+    Copy many files or directories at once. `pairs` are tuples of
+    `(source, destination)` and every destination is the exact new path.
+    """
+    return run_bulk(copy_one, pairs, workers, check)
+
+def bulk_move(pairs, workers=None, overwrite=False, check=False):
+    """
+    Move many files or directories at once. `pairs` are tuples of
+    `(source, destination)` and every destination is the exact new path.
+    Moves on the same filesystem are renames, others are copies.
+    """
+    move = lambda source, destination: move_one(source, destination,
+                                                overwrite)
+    return run_bulk(move, pairs, workers, check)
+
+def bulk_remove(paths, workers=None, check=False):
+    """Remove many files or directories at once."""
+    remove = lambda path, destination: remove_one(path)
+    return run_bulk(remove, [(path, None) for path in paths], workers, check)
+
+###############################################################################
+def copy_tree(source, destination, workers=None):
+    """
+    Copy a directory recursively. The directory structure is created first,
+    then the files are copied in parallel on a pool of `workers` threads,
+    using the fast copy engine. Symbolic links are copied as links.
+    """
+    source, destination = as_str(source), as_str(destination)
+    if os.path.lexists(destination):
+        raise Exception("The path '%s' already exists." % destination)
+    # Create the structure #
+    files = []
+    directories = []
+    for root, dirs, names in os.walk(source):
+        relative = os.path.relpath(root, source)
+        target   = os.path.normpath(os.path.join(destination, relative))
+        os.makedirs(target)
+        directories.append((root, target))
+        for name in dirs:
+            if os.path.islink(os.path.join(root, name)): names.append(name)
+        for name in names:
+            files.append((os.path.join(root, name),
+                          os.path.join(target, name)))
+    # Copy the files #
+    run_bulk(copy_entry, files, workers, check=True)
+    # Directory permissions and times, deepest first #
+    for root, target in reversed(directories): shutil.copystat(root, target)
+    return destination
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time, hashlib, mmap, sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+from autopaths.dir_index import racy_window
+
+# Constants #
+buffer_size = 1 << 22
+constructors = {'md5':     hashlib.md5,
+                'sha1':    hashlib.sha1,
+                'sha256':  hashlib.sha256,
+                'sha512':  hashlib.sha512,
+                'blake2':  hashlib.blake2b,
+                'blake2b': hashlib.blake2b,
+                'blake2s': hashlib.blake2s}
+
+###############################################################################
+def compute_digests(path, algorithms=('md5',), buffer_size=buffer_size,
+                    use_mmap=False):
+    """
+    Compute several digests of a file in a single pass over its contents.
+    Returns a dictionary such as `{'md5': '...', 'sha256': '...'}`.
+    When several algorithms are requested, each block is fed to the hashes
+    concurrently since `hashlib` releases the GIL on large buffers.
+    """
+    # Check the algorithms #
+    for name in algorithms:
+        if name not in constructors:
+            raise Exception("Unrecognized hash algorithm '%s'." % name)
+    # Create the hash objects #
+    hashes = {name: constructors[name]() for name in algorithms}
+    # The blocks generator #
+    if use_mmap: blocks = mmap_blocks(path, buffer_size)
+    else:        blocks = read_blocks(path, buffer_size)
+    # Only one algorithm #
+    if len(hashes) == 1:
+        h = list(hashes.values())[0]
+        for block in blocks: h.update(block)
+    # Several algorithms #
+    else:
+        with ThreadPoolExecutor(max_workers=len(hashes)) as pool:
+            for block in blocks:
+                list(pool.map(lambda h: h.update(block), hashes.values()))
+    # Return #
+    return {name: h.hexdigest() for name, h in hashes.items()}
+
+def read_blocks(path, buffer_size=buffer_size):
+    """Yield the contents of a file in large blocks."""
+    with open(path, 'rb', buffering=0) as handle:
+        for block in iter(lambda: handle.read(buffer_size), b""): yield block
+
+def mmap_blocks(path, buffer_size=buffer_size):
+    """
+    Yield the contents of a file in large memory mapped windows, as views
+    that don't copy the data. Each view is only valid until the next one
+    is requested, and all are released before the map is closed.
+    """
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0: return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            with memoryview(m) as whole:
+                for i in range(0, len(m), buffer_size):
+                    with whole[i:i + buffer_size] as window: yield window
+
+###############################################################################
+class ChecksumCache(object):
+    """
+    A persistent on-disk cache of file digests, stored in a small sqlite
+    database. Entries are keyed by (device, inode, size, mtime_ns) so that
+    a file that has not changed is never hashed twice, even between
+    different runs of a pipeline. Renaming a file keeps its entry valid.
+
+    The default location is `~/.cache/autopaths/checksums.sqlite` but
+    can be changed with the `AUTOPATHS_CHECKSUM_CACHE` environment variable.
+    """
+
+    def __repr__(self):
+        return '<%s object on "%s">' % (self.__class__.__name__, self.path)
+
+    def __init__(self, path=None):
+        # Default location #
+        if path is None: path = os.environ.get('AUTOPATHS_CHECKSUM_CACHE')
+        if path is None:
+            cache_dir = os.environ.get('XDG_CACHE_HOME', '~/.cache')
+            cache_dir = os.path.expanduser(cache_dir)
+            path = os.path.join(cache_dir, 'autopaths', 'checksums.sqlite')
+        self.path = path
+
+    @staticmethod
+    def key(path):
+        """The key used to identify a given version of a file."""
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def connect(self):
+        # Create the directory if needed #
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Connect #
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute("CREATE TABLE IF NOT EXISTS digests ("
+                           "dev INTEGER, ino INTEGER, size INTEGER,"
+                           "mtime_ns INTEGER, algorithm TEXT, digest TEXT,"
+                           "PRIMARY KEY (dev, ino, size, mtime_ns, algorithm))")
+        return connection
+
+    def get(self, key, algorithms):
+        """Return the digests that are already known for a given key."""
+        query = ("SELECT algorithm, digest FROM digests WHERE"
+                 " dev=? AND ino=? AND size=? AND mtime_ns=?")
+        connection = self.connect()
+        try:
+            rows = connection.execute(query, key).fetchall()
+        finally:
+            connection.close()
+        return {algo: digest for algo, digest in rows if algo in algorithms}
+
+    def set(self, key, digests):
+        """Record new digests for a given key."""
+        query = "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)"
+        rows = [key + (algo, digest) for algo, digest in digests.items()]
+        connection = self.connect()
+        try:
+            with connection: connection.executemany(query, rows)
+        finally:
+            connection.close()
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        if os.path.exists(self.path): os.remove(self.path)
+
+# The default instance #
+default_cache = ChecksumCache()
+
+###############################################################################
+def checksums(path, algorithms=('md5',), cache=True, **kwargs):
+    """
+    Return the requested digests of a file, only reading the file for
+    the digests not already recorded in the cache. Pass `cache=False`
+    to skip the cache or your own `ChecksumCache` object to use it.
+    Problems with the cache (e.g. read-only home directory) are ignored.
+    Files modified in the last couple of seconds are not cached, since
+    they could be rewritten with the same size and modification time.
+    """
+    # Pick the cache #
+    if cache is True: cache = default_cache
+    if not cache: return compute_digests(path, algorithms, **kwargs)
+    # Look for known digests #
+    key = cache.key(path)
+    try: known = cache.get(key, algorithms)
+    except (sqlite3.Error, OSError): known = {}
+    # Compute the missing ones #
+    missing = [algo for algo in algorithms if algo not in known]
+    if missing:
+        computed = compute_digests(path, missing, **kwargs)
+        # The file might have changed while we were reading it, or could
+        # still change within the resolution of its modification time #
+        racy = time.time_ns() - key[3] < racy_window
+        if cache.key(path) == key and not racy:
+            try: cache.set(key, computed)
+            except (sqlite3.Error, OSError): pass
+        known.update(computed)
+    # Return in the same order #
+    return {algo: known[algo] for algo in algorithms}
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import io, bz2, lzma, queue, threading
+
+# Internal modules #
+from autopaths.sniff import compression_of
+from autopaths.gzip_index import iter_gunzip
+
+# Constants #
+buffer_size = 1 << 20
+prefetch    = 8
+streamable  = ('gzip', 'bz2', 'xz', 'zstd')
+
+###############################################################################
+def detect_compression(path):
+    """Return 'gzip', 'bz2', 'xz' or 'zstd' if the file is compressed."""
+    with open(path, 'rb') as handle: start = handle.read(8)
+    fmt = compression_of(start)
+    return fmt if fmt in streamable else None
+
+def iter_multistream(handle, new_decompressor, buffer_size=buffer_size):
+    """
+    Yield decompressed chunks with a `bz2` or `lzma` decompressor,
+    continuing with a new decompressor when several compressed streams
+    are concatenated one after the other.
+    """
+    decompressor = new_decompressor()
+    data = b''
+    while True:
+        # Get more input unless some output is still pending #
+        if not data and decompressor.needs_input:
+            data = handle.read(buffer_size)
+            if not data: break
+        # Decompress without producing unlimited output #
+        chunk = decompressor.decompress(data, buffer_size)
+        data  = b''
+        if chunk: yield chunk
+        # The current stream is finished, maybe there is another one #
+        if decompressor.eof:
+            data = decompressor.unused_data or handle.read(buffer_size)
+            if not data.strip(b'\0'): break
+            decompressor = new_decompressor()
+
+def iter_zstd(handle, buffer_size=buffer_size):
+    """Yield decompressed chunks of zstd data, needs `zstandard`."""
+    import zstandard
+    decompressor = zstandard.ZstdDecompressor()
+    reader = decompressor.stream_reader(handle, read_across_frames=True)
+    for chunk in iter(lambda: reader.read(buffer_size), b""): yield chunk
+
+def iter_decompressed(path, fmt=None, buffer_size=buffer_size):
+    """
+    Yield the decompressed contents of a file in large chunks, detecting
+    the compression format from the magic number unless `fmt` is given.
+    Uncompressed files are simply read in chunks.
+    """
+    if fmt is None: fmt = detect_compression(path)
+    with open(path, 'rb') as handle:
+        if fmt == 'gzip':   chunks = iter_gunzip(handle, buffer_size)
+        elif fmt == 'bz2':  chunks = iter_multistream(handle,
+                                     bz2.BZ2Decompressor, buffer_size)
+        elif fmt == 'xz':   chunks = iter_multistream(handle,
+                                     lzma.LZMADecompressor, buffer_size)
+        elif fmt == 'zstd': chunks = iter_zstd(handle, buffer_size)
+        elif fmt is None:   chunks = iter(lambda: handle.read(buffer_size),
+                                          b"")
+        else: raise Exception("Unrecognized compression format '%s'." % fmt)
+        for chunk in chunks: yield chunk
+
+###############################################################################
+class ChunkReader(io.RawIOBase):
+    """
+    A readable binary stream built on top of an iterator of chunks.
+    With `threaded`, the iterator is consumed in a background thread that
+    stays up to `prefetch` chunks ahead, so that decompression overlaps with
+    whatever the consumer is doing.
+    """
+
+    def __init__(self, chunks, threaded=True, prefetch=prefetch):
+        self.chunks  = chunks
+        self.pending = memoryview(b'')
+        self.thread  = None
+        self.done    = False
+        if threaded: self.start(prefetch)
+
+    def start(self, prefetch):
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.stop  = threading.Event()
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+        self.thread.start()
+
+    def produce(self):
+        """Runs in the background thread."""
+        try:
+            for chunk in self.chunks:
+                while not self.stop.is_set():
+                    try: self.queue.put(chunk, timeout=0.1)
+                    except queue.Full: continue
+                    break
+                if self.stop.is_set(): return
+            item = None
+        except BaseException as error:
+            item = error
+        while not self.stop.is_set():
+            try: self.queue.put(item, timeout=0.1)
+            except queue.Full: continue
+            break
+
+    def next_chunk(self):
+        """Get the next chunk, or None when there is no more data."""
+        if self.done: return None
+        if self.thread is None: chunk = next(self.chunks, None)
+        else:                   chunk = self.queue.get()
+        if isinstance(chunk, BaseException):
+            self.done = True
+            raise chunk
+        if chunk is None: self.done = True
+        return chunk
+
+    def readable(self): return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            chunk = self.next_chunk()
+            if chunk is None: return 0
+            self.pending = memoryview(chunk)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+        if hasattr(self.chunks, 'close'): self.chunks.close()
+        super().close()
+
+###############################################################################
+def open_decompressed(path, mode='r', encoding=None, errors=None,
+                      newline=None, threaded=True, buffer_size=buffer_size):
+    """
+    Like the built-in `open` for reading, except that gzip, bz2, xz and
+    zstd files are detected from their magic number and decompressed while
+    streaming, with large buffers and in a background thread.
+    Writing modes and uncompressed files get a normal file object.
+    """
+    # Only reading is transparent #
+    if set(mode) & set('wax+'): return open(path, mode, encoding=encoding,
+                                            errors=errors, newline=newline)
+    fmt = detect_compression(path)
+    if fmt is None: return open(path, mode, encoding=encoding,
+                                errors=errors, newline=newline)
+    # The decompressed binary stream #
+    chunks = iter_decompressed(path, fmt, buffer_size)
+    raw    = ChunkReader(chunks, threaded)
+    binary = io.BufferedReader(raw, buffer_size)
+    if 'b' in mode: return binary
+    return io.TextIOWrapper(binary, encoding=encoding, errors=errors,
+                            newline=newline)
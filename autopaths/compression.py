@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, bz2, lzma, zipfile, collections
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Internal modules #
+from autopaths.parallel_gzip import parallel_gzip
+from autopaths.compressed_io import detect_compression, iter_decompressed
+
+# Constants #
+chunk_size     = 1 << 23
+extensions     = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zip': '.zip',
+                  'zstd': '.zst'}
+default_levels = {'gzip': 6, 'bz2': 9, 'xz': 6, 'zip': 6}
+
+###############################################################################
+def compress_bz2(data, level): return bz2.compress(data, level)
+
+def compress_xz(data, level): return lzma.compress(data, preset=level)
+
+def parallel_map_ordered(function, items, level, workers=None,
+                         pool='process'):
+    """
+    Apply `function(item, level)` to every item on a pool of workers and
+    yield the results in order, never keeping more than a few items
+    in flight so that memory use stays bounded.
+    """
+    # Pick the pool #
+    if pool == 'process': executor = ProcessPoolExecutor
+    elif pool == 'thread': executor = ThreadPoolExecutor
+    else: raise Exception("Unrecognized pool type '%s'." % pool)
+    workers = workers or os.cpu_count() or 1
+    # Dispatch #
+    with executor(max_workers=workers) as ex:
+        pending = collections.deque()
+        for item in items:
+            pending.append(ex.submit(function, item, level))
+            if len(pending) > 2 * workers: yield pending.popleft().result()
+        while pending: yield pending.popleft().result()
+
+def read_chunks(path, chunk_size=chunk_size):
+    """Yield the contents of a file in large independent chunks."""
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""): yield chunk
+
+###############################################################################
+def compress_file(source, destination=None, fmt='gzip', level=None,
+                  workers=None, pool='process', chunk_size=chunk_size):
+    """
+    Compress a file in one of several formats:
+
+    * 'gzip', independent blocks compressed on a thread pool and written
+      as a multi-member gzip file.
+    * 'bz2' and 'xz', independent chunks compressed on a pool of `workers`
+      (processes by default) and written as a multi-stream file, which the
+      standard `bzip2` and `xz` tools as well as python read back entirely.
+    * 'zip', a zip archive with a single deflated member.
+
+    Returns the path of the new file.
+    """
+    # Default values #
+    if fmt not in default_levels:
+        raise Exception("Unrecognized compression format '%s'." % fmt)
+    if level is None: level = default_levels[fmt]
+    if destination is None: destination = source + extensions[fmt]
+    source, destination = str(source), str(destination)
+    # Gzip #
+    if fmt == 'gzip':
+        parallel_gzip(source, destination, level, chunk_size, workers)
+    # Zip #
+    elif fmt == 'zip':
+        with zipfile.ZipFile(destination, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=level) as archive:
+            archive.write(source, os.path.basename(source))
+    # Multi-stream bz2 and xz #
+    else:
+        function = compress_bz2 if fmt == 'bz2' else compress_xz
+        chunks   = read_chunks(source, chunk_size)
+        with open(destination, 'wb') as handle:
+            for data in parallel_map_ordered(function, chunks, level,
+                                             workers, pool):
+                handle.write(data)
+    # Return #
+    return destination
+
+def decompress_file(source, destination=None, fmt=None,
+                    buffer_size=1 << 20):
+    """
+    Decompress a gzip, bz2, xz, zstd or single member zip file. The format
+    is detected from the magic number unless `fmt` is given. Returns the
+    path of the new file.
+    """
+    # Detect the format #
+    source = str(source)
+    if fmt is None: fmt = detect_compression(source)
+    if fmt is None and zipfile.is_zipfile(source): fmt = 'zip'
+    if fmt is None:
+        raise Exception("The file '%s' is not compressed." % source)
+    # Default destination #
+    if destination is None:
+        if not source.endswith(extensions[fmt]):
+            msg = "Cannot guess the destination of '%s', please specify it."
+            raise Exception(msg % source)
+        destination = source[:-len(extensions[fmt])]
+    destination = str(destination)
+    # Zip #
+    if fmt == 'zip':
+        with zipfile.ZipFile(source) as archive:
+            members = archive.infolist()
+            if len(members) != 1:
+                msg = "The zip file '%s' has %i members instead of one."
+                raise Exception(msg % (source, len(members)))
+            with archive.open(members[0]) as in_handle:
+                with open(destination, 'wb') as out_handle:
+                    for chunk in iter(lambda: in_handle.read(buffer_size),
+                                      b""):
+                        out_handle.write(chunk)
+    # Streams #
+    else:
+        with open(destination, 'wb') as handle:
+            for chunk in iter_decompressed(source, fmt, buffer_size):
+                handle.write(chunk)
+    # Return #
+    return destination
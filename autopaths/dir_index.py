@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time
+
+# Constants #
+racy_window = 2 * 10**9
+
+# The cache #
+cache = {}
+max_cache_entries = 1 << 12
+
+###############################################################################
+class ListingIndex(object):
+    """
+    The names found in a directory, mapped to True for sub-directories and
+    False for everything else, so that membership tests and lookups don't
+    need to list the directory again.
+
+    The listing is considered current as long as the modification time of
+    the directory doesn't change, since creating, removing or renaming an
+    entry always updates it. A directory that was modified just before
+    being listed might be modified again within the resolution of the
+    clock, so in that case the listing is not trusted and is redone on
+    the next access.
+    """
+
+    def __repr__(self):
+        return '<%s object on "%s">' % (self.__class__.__name__, self.path)
+
+    def __init__(self, path):
+        self.path = path
+        self.refresh()
+
+    def __len__(self): return len(self.entries)
+
+    def __contains__(self, name): return name in self.entries
+
+    def __iter__(self): return iter(self.entries)
+
+    @staticmethod
+    def stamp_of(path):
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+    def refresh(self):
+        """
+        List the directory again. A directory that can't be listed,
+        for instance because it doesn't exist, appears empty.
+        """
+        try:
+            self.stamp = self.stamp_of(self.path)
+            with os.scandir(self.path) as it:
+                self.entries = {entry.name: entry.is_dir() for entry in it}
+            self.racy = time.time_ns() - self.stamp[2] < racy_window
+        except OSError:
+            self.stamp, self.entries, self.racy = None, {}, True
+        return self
+
+    @property
+    def is_current(self):
+        """Check that the directory didn't change since it was listed."""
+        if self.racy: return False
+        try: return self.stamp_of(self.path) == self.stamp
+        except OSError: return False
+
+###############################################################################
+def get_index(path, refresh=False):
+    """
+    Get the listing index of a directory, reusing the cached one when the
+    directory didn't change since then.
+    """
+    path  = os.path.abspath(str(path))
+    index = cache.get(path)
+    if index is not None and not refresh and index.is_current: return index
+    if index is not None: return index.refresh()
+    if len(cache) >= max_cache_entries: cache.clear()
+    index = cache[path] = ListingIndex(path)
+    return index
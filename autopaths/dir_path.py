@@ -8,10 +8,21 @@ Contact at www.sinclair.bio
 """
 
 # Built-in modules #
-import os, shutil, glob
+import os, shutil
 
 # Internal modules #
 import autopaths
+from autopaths.archive_builder import build_tar, build_zip
+from autopaths.bulk_ops import bulk_move, copy_tree
+from autopaths.dir_walk import walk, parallel_walk
+from autopaths.disk_usage import disk_usage
+from autopaths.dir_index import get_index
+from autopaths.dir_snapshot import Snapshot, Diff
+from autopaths.dir_watch import Watcher
+from autopaths.path_glob import iglob
+from autopaths.duplicates import find_duplicates, group_duplicates
+from autopaths.duplicates import replace_duplicates
+from autopaths.dir_prune import remove_empty_dirs
 
 # Constants #
 if os.name == "posix": sep = "/"
@@ -24,18 +35,29 @@ class DirectoryPath(autopaths.base_path.BasePath):
     with directories.
     """
 
-    def __len__(self): return len(list(self.flat_contents))
+    def __len__(self): return len(self.listing())
 
     def __iter__(self): return self.flat_contents
 
     def __contains__(self, item):
-        return item in [x.name for x in self.flat_contents]
+        return item in self.listing()
 
     def __getitem__(self, item):
-        for path in self.flat_contents:
-            if path.name == item:
-                return path
-        raise KeyError("Couldn't find '%s' in '%s'" % (item, self.path))
+        listing = self.listing()
+        if item not in listing:
+            raise KeyError("Couldn't find '%s' in '%s'" % (item, self.path))
+        if listing.entries[item]:
+            return DirectoryPath.from_clean(self.path + item + sep)
+        return autopaths.file_path.FilePath.from_clean(self.path + item)
+
+    def listing(self, refresh=False):
+        """
+        The names in this directory, listed once and cached until the
+        directory is modified. Used for `len()`, `in` and `[]` which are
+        thus constant time after the first call. Pass `refresh` to force
+        a new listing.
+        """
+        return get_index(self.path, refresh)
 
     #------------------------------- Properties ------------------------------#
     @property
@@ -95,44 +117,138 @@ class DirectoryPath(autopaths.base_path.BasePath):
 
     @property
     def size(self):
-        """The total size in bytes of all file contents."""
-        total = sum(f.count_bytes for f in self.files)
+        """
+        The total size in bytes of all file contents. Symbolic links to
+        files count as the file they point to. Files with several hard
+        links are counted once. See `self.disk_usage` for more.
+        """
+        total = disk_usage(self.path, follow_links=True).apparent
         return autopaths.file_size.FileSize(total)
 
+    def disk_usage(self, workers=16, breakdown=0, dedup=True):
+        """
+        Like `du`, returns an object with the `apparent` size of the files,
+        the `allocated` size on disk, and the number of `files` and
+        `directories`. The directories are listed and the files are
+        stat'ed by a pool of `workers` threads. With `breakdown`, the
+        `children` dictionary gives the same numbers for every
+        sub-directory, for that many levels.
+        See `autopaths.disk_usage.disk_usage`.
+        """
+        return disk_usage(self.path, workers, breakdown, dedup)
+
     #-------------------------- Recursive contents ---------------------------#
+    def walk(self, topdown=True, max_depth=None, prune=None,
+             follow_symlinks=False, onerror=None, workers=None, ordered=False):
+        """
+        Iterate over everything below this directory with `os.scandir`.
+        Yields lightweight entries that have a `name`, a `path`, a `depth`,
+        and cache the results of `is_dir()` and `stat()`. Call `to_path()`
+        on them to get a `FilePath` or `DirectoryPath`. Subtrees can be
+        skipped with `max_depth` or with a `prune(entry)` function.
+        See `autopaths.dir_walk.walk` for the details.
+
+        With `workers`, directories are listed concurrently by that many
+        threads, which is much faster on network filesystems. Entries then
+        come in no particular order unless `ordered` is set.
+        See `autopaths.dir_walk.parallel_walk`.
+        """
+        if workers is None:
+            return walk(self.path, topdown, max_depth, prune,
+                        follow_symlinks, onerror)
+        if not topdown:
+            raise Exception("A parallel walk can only be top down.")
+        return parallel_walk(self.path, workers, ordered, max_depth, prune,
+                             follow_symlinks, onerror)
+
     @property
     def contents(self):
         """The files and directories in this directory, recursively."""
-        for root, dirs, files in os.walk(self.path, topdown=False):
-            for d in dirs:
-                yield DirectoryPath(os.path.join(root, d))
-            for f in files:
-                yield autopaths.file_path.FilePath(os.path.join(root, f))
+        for entry in walk(self.path, topdown=False): yield entry.to_path()
 
     @property
     def files(self):
         """The files in this directory, recursively."""
-        for root, dirs, files in os.walk(self.path, topdown=False):
-            for f in files:
-                yield autopaths.file_path.FilePath(os.path.join(root, f))
+        for entry in walk(self.path, topdown=False):
+            if not entry.is_dir():
+                yield autopaths.file_path.FilePath.from_clean(entry.path)
 
     @property
     def directories(self):
         """The directories in this directory, recursively."""
-        for root, dirs, files in os.walk(self.path, topdown=False):
-            for d in dirs:
-                yield DirectoryPath(os.path.join(root, d))
+        for entry in walk(self.path, topdown=False):
+            if entry.is_dir():
+                yield DirectoryPath.from_clean(entry.path + sep)
+
+    #------------------------------- Snapshots -------------------------------#
+    def snapshot(self, previous=None, fast=False):
+        """
+        Record the size, mtime, inode and mode of everything below this
+        directory. Passing a `previous` snapshot (or the path to a saved
+        one) makes the scan cheaper, see `autopaths.dir_snapshot.Snapshot`.
+        """
+        if previous is not None and not isinstance(previous, Snapshot):
+            previous = Snapshot.load(previous)
+        return Snapshot.take(self.path, previous, fast)
+
+    def changes_since(self, path, fast=False, update=True):
+        """
+        Compare the directory with the snapshot saved in the file `path`
+        and return the sets of relative paths that were `added`, `removed`
+        and `modified`. With `update`, the file is then replaced by a new
+        snapshot, so that the next call reports the changes since this one.
+        The first time, when the file doesn't exist, everything is added.
+        """
+        previous = Snapshot.load(path) if os.path.exists(path) else None
+        current  = Snapshot.take(self.path, previous, fast)
+        if update: current.save(path)
+        if previous is None: return Diff(set(current.entries), set(), set())
+        return previous.diff(current)
+
+    def watch(self, recursive=True, debounce=0.0, interval=1.0, settle=None,
+              backend='auto'):
+        """
+        Return a stream of the events happening in this directory, such as
+        files being 'created', 'modified', 'moved', 'deleted' or
+        'finished' (closed after writing). Iterate over it, or call its
+        `read(timeout)` method. Uses inotify on Linux and otherwise
+        compares snapshots every `interval` seconds, in which case files
+        are finished once they didn't change for `settle` seconds.
+        With `debounce`, bursts of events on the same path are merged.
+        See `autopaths.dir_watch.Watcher`.
+        """
+        return Watcher(self.path, recursive, debounce, interval, settle,
+                       backend)
+
+    #------------------------------ Duplicates -------------------------------#
+    def find_duplicates(self, *others, workers=16, min_size=1,
+                        algorithm='sha256'):
+        """
+        Find the files with identical contents in this directory and the
+        `others`. Files are compared by size, then by their first and
+        last blocks, and only then hashed entirely, in parallel. Returns
+        a list of groups of `FilePath` objects.
+        See `autopaths.duplicates.find_duplicates`.
+        """
+        return find_duplicates([self.path] + list(others), workers=workers,
+                               min_size=min_size, algorithm=algorithm)
+
+    def deduplicate(self, *others, method='hardlink', dry_run=False,
+                    **kwargs):
+        """
+        Replace every duplicate file by a hard link (or a reflink with
+        `method='reflink'`) to the first file of its group. Returns one
+        outcome per replaced file, see `autopaths.bulk_ops.Outcome`.
+        Files modified since they were compared are not replaced.
+        """
+        groups = group_duplicates([self.path] + list(others), **kwargs)
+        return replace_duplicates(groups, method, dry_run)
 
     #----------------------------- Flat contents -----------------------------#
     @property
     def flat_contents(self):
         """The files and directories in this directory non-recursively."""
-        for root, dirs, files in os.walk(self.path):
-            for d in dirs:
-                yield DirectoryPath(os.path.join(root, d))
-            for f in files:
-                yield autopaths.file_path.FilePath(os.path.join(root, f))
-            break
+        for entry in walk(self.path, max_depth=1): yield entry.to_path()
 
     @property
     def flat_files(self):
@@ -140,23 +256,18 @@ class DirectoryPath(autopaths.base_path.BasePath):
         The files in this directory non-recursively, and sorted.
         #TODO: check for permission denied in directory.
         """
-        for root, dirs, files in os.walk(self.path):
-            result = [autopaths.file_path.FilePath(os.path.join(root, f))
-                      for f in files]
-            break
-        else:
-            result = []
+        result = [autopaths.file_path.FilePath.from_clean(entry.path)
+                  for entry in walk(self.path, max_depth=1)
+                  if not entry.is_dir()]
         result.sort(key=lambda x: autopaths.common.natural_sort(x.path))
         return result
 
     @property
     def flat_directories(self):
         """The directories in this directory non-recursively, and sorted."""
-        for root, dirs, files in os.walk(self.path):
-            result = [DirectoryPath(os.path.join(root, d)) for d in dirs]
-            break
-        else:
-            result = []
+        result = [DirectoryPath.from_clean(entry.path + sep)
+                  for entry in walk(self.path, max_depth=1)
+                  if entry.is_dir()]
         result.sort(key=lambda x: autopaths.common.natural_sort(x.path))
         return result
 
@@ -206,56 +317,104 @@ class DirectoryPath(autopaths.base_path.BasePath):
         # Update the internal link #
         self.path = path
 
-    def copy(self, path):
+    def copy(self, path, workers=None):
+        """
+        Copy the directory. The files are copied in parallel on a pool of
+        `workers` threads, using the fast copy engine for every file.
+        """
         assert not os.path.exists(path)
-        shutil.copytree(str(self.path), str(path))
+        copy_tree(self.path, path, workers)
 
-    def glob(self, pattern):
+    def iglob(self, pattern, exclude=None):
+        """
+        Lazily yield the `FilePath` objects matching a pattern in this
+        directory. The `pattern` is a glob where `**` matches any number
+        of sub-directories, a compiled regular expression searched in the
+        relative paths, or a set of name endings like `{'.fq', '.fq.gz'}`.
+        Directories matching `exclude` (a list of glob patterns or a
+        function taking the relative path) are not descended into.
+        See `autopaths.path_glob.Matcher`.
+        """
+        FilePath = autopaths.file_path.FilePath
+        for path in iglob(self.path, pattern, exclude):
+            yield FilePath.from_clean(path)
+
+    def glob(self, pattern, exclude=None):
         """Perform a glob search in this directory."""
-        files = glob.glob(self.path + pattern)
-        return list(map(autopaths.file_path.FilePath, files))
+        return list(self.iglob(pattern, exclude))
 
-    def find(self, pattern):
-        """Find a file in this directory."""
-        f = glob.glob(self.path + pattern)[0]
-        return autopaths.file_path.FilePath(f)
+    def find(self, pattern, exclude=None):
+        """Find a file in this directory, stopping at the first match."""
+        for path in self.iglob(pattern, exclude): return path
+        raise Exception("Found exactly no paths matching '%s' in '%s'" %
+                        (pattern, self))
 
     def unnest(self):
         """
         Move all contents (files and directories) of this directory to its
         parent directory, and remove this directory.
         """
-        for item in self.flat_contents: item.move_to(self.directory)
+        pairs = [(item, self.directory + item.name)
+                 for item in self.flat_contents]
+        bulk_move(pairs, check=True)
         self.remove()
 
-    def remove_empty_dirs(self):
+    def remove_empty_dirs(self, dry_run=False, workers=None):
         """
         Find all empty directories within this directory recursively,
-        and remove them.
+        and remove them. Directories that only contain empty directories
+        or `.DS_Store` files are removed too, in cascade, with a single
+        walk of the tree. With `dry_run`, only report what would be
+        removed. Returns the list of directories removed.
+        See `autopaths.dir_prune.remove_empty_dirs`.
         """
-        for directory in self.directories:
-            if directory.empty:
-                directory.remove()
+        paths = remove_empty_dirs(self.path, dry_run, workers)
+        return [DirectoryPath.from_clean(path + sep) for path in paths]
 
     #---------------------------- TAR compression ----------------------------#
-    def tar_to(self, path=None):
-        """Make a tared version of the directory at a given path."""
-        pass
+    def tar_to(self, path=None, exclude=None, sort=True):
+        """
+        Make a tared version of the directory at a given path.
+        The members are streamed into the archive without any staging.
+        `exclude` is a list of glob patterns or a function taking the
+        relative path of an item. Returns the new file.
+        """
+        # Case where path is None #
+        if path is None: path = self.directory + self.name + ".tar"
+        # Build #
+        build_tar(self.path, path, None, exclude=exclude, sort=sort)
+        # Return #
+        return autopaths.file_path.FilePath(path)
 
-    def targz_to(self, path=None):
-        """Make a targzipped version of the directory at a given path."""
-        pass
+    def targz_to(self, path=None, level=6, workers=None, exclude=None,
+                 sort=True, store_compressed=True):
+        """
+        Make a targzipped version of the directory at a given path.
+        The tar stream is compressed in independent blocks on a pool of
+        `workers` threads, and members that are already compressed are
+        not compressed a second time (see `store_compressed`).
+        See `autopaths.archive_builder.build_tar` for the details.
+        Returns the new file.
+        """
+        # Case where path is None #
+        if path is None: path = self.directory + self.name + ".tar.gz"
+        # Build #
+        build_tar(self.path, path, 'gzip', level, workers, exclude, sort,
+                  store_compressed)
+        # Return #
+        return autopaths.file_path.FilePath(path)
 
     #---------------------------- ZIP compression ----------------------------#
-    def zip_to(self, path=None):
-        """Make a zipped version of the directory at a given path."""
+    def zip_to(self, path=None, level=6, exclude=None, sort=True,
+               store_compressed=True):
+        """
+        Make a zipped version of the directory at a given path.
+        Members that are already compressed are stored as they are.
+        Returns the new file.
+        """
         # Case where path is None #
         if path is None: path = self.directory + self.name + ".zip"
-        else: path = autopaths.file_path.FilePath(path)
-        # The method adds .zip so let's remove it #
-        if path.endswith('.zip'): path_no_ext = path.prefix_path
-        else:                     path_no_ext = path
-        # Compress #
-        shutil.make_archive(path_no_ext, 'zip', self.path)
+        # Build #
+        build_zip(self.path, path, level, exclude, sort, store_compressed)
         # Return #
-        return path_no_ext
\ No newline at end of file
+        return autopaths.file_path.FilePath(path)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, collections
+
+# Internal modules #
+from autopaths.dir_walk import walk
+from autopaths.bulk_ops import run_bulk
+
+# Constants #
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+ignored_names = frozenset(['.DS_Store'])
+
+###############################################################################
+def find_empty_dirs(top, ignore=ignored_names):
+    """
+    Find every directory below `top` that contains nothing, or only
+    files named in `ignore`, or only directories that are themselves
+    empty. A single bottom-up walk is done: every directory is reached
+    after its contents, so it is empty unless some entry inside it was
+    kept. The `top` directory itself is never included.
+
+    Returns a list of `(path, ignored_files)` tuples, every directory
+    coming after the directories it contains.
+    """
+    top    = str(top).rstrip(sep) or sep
+    kept   = set()
+    found  = []
+    files  = collections.defaultdict(list)
+    # Directories that can't be listed are not empty #
+    onerror = lambda error: kept.add(error.filename)
+    for item in walk(top, topdown=False, onerror=onerror):
+        parent = os.path.dirname(item.path)
+        # A real directory, its contents were seen already #
+        if item.is_dir(follow_symlinks=False):
+            if item.path in kept: kept.discard(item.path)
+            else:
+                found.append((item.path, files.pop(item.path, [])))
+                continue
+        # A file that doesn't count #
+        elif item.name in ignore:
+            files[parent].append(item.path)
+            continue
+        # Anything else keeps its parent #
+        kept.add(parent)
+    return found
+
+def remove_empty(path, ignored=()):
+    """
+    Remove one empty directory and the ignored files in it. The directory
+    is listed again first, so that one that is not empty anymore is left
+    untouched, ignored files included, and an exception is raised.
+    """
+    if ignored:
+        expected = set(os.path.basename(name) for name in ignored)
+        if set(os.listdir(path)) != expected:
+            raise Exception("The directory '%s' is not empty anymore." % path)
+        for name in ignored: os.remove(name)
+    os.rmdir(path)
+
+###############################################################################
+def remove_empty_dirs(top, dry_run=False, workers=None, ignore=ignored_names):
+    """
+    Remove every empty directory below `top`, including the directories
+    that only contain empty directories, in cascade. The directories are
+    removed level by level from the deepest one, the directories of a
+    level being removed in parallel on a pool of `workers` threads.
+
+    With `dry_run`, nothing is removed. Returns the list of paths removed,
+    or that would be removed, deepest first. Directories that could not
+    be removed, for instance because something was created in them in
+    the meantime, are left out along with their parents.
+    """
+    found = find_empty_dirs(top, ignore)
+    if dry_run: return [path for path, ignored in found]
+    # Group by depth #
+    levels = collections.defaultdict(list)
+    for path, ignored in found: levels[path.count(sep)].append((path, ignored))
+    # Remove the deepest first #
+    removed = []
+    for depth in sorted(levels, reverse=True):
+        ignored = dict(levels[depth])
+        remove  = lambda path, destination: remove_empty(path, ignored[path])
+        results = run_bulk(remove, [(p, None) for p in ignored], workers)
+        removed.extend(result.source for result in results if result.ok)
+    return removed
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, stat, gzip, json, time, collections
+
+# Internal modules #
+from autopaths.dir_index import racy_window
+
+# Constants #
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+
+# The differences between two snapshots #
+Diff = collections.namedtuple('Diff', 'added removed modified')
+
+###############################################################################
+class Snapshot(object):
+    """
+    A compact record of everything below a directory. Every entry is
+    stored under its path relative to the root as a tuple of
+    `(size, mtime_ns, inode, mode)`. Snapshots can be saved to a file,
+    loaded again, and compared with `diff`.
+    """
+
+    def __repr__(self):
+        return '<%s object of "%s" with %i entries>' % \
+               (self.__class__.__name__, self.root, len(self.entries))
+
+    def __init__(self, root, root_mtime, entries, taken_at=None):
+        self.root       = root
+        self.root_mtime = root_mtime
+        self.entries    = entries
+        self.taken_at   = taken_at
+
+    def __len__(self): return len(self.entries)
+
+    def __contains__(self, relative): return relative in self.entries
+
+    #------------------------------- Creating --------------------------------#
+    @classmethod
+    def take(cls, root, previous=None, fast=False):
+        """
+        Scan a directory. When a `previous` snapshot of the same directory
+        is given, directories whose mtime didn't change are not listed
+        again, since their names are known already: only their entries
+        are stat'ed. With `fast`, even that is skipped and the files of
+        unchanged directories are copied from the previous snapshot, which
+        only misses files that were modified in place rather than created,
+        removed or renamed.
+        """
+        # The root #
+        taken_at = time.time_ns()
+        root     = str(root).rstrip(sep) or sep
+        mtime    = os.lstat(root).st_mtime_ns
+        entries  = {}
+        # What we knew #
+        if previous is not None and previous.root == root:
+            known, names = previous.entries, previous.children()
+            known_mtimes = previous.directory_mtimes()
+        else:
+            known, names, known_mtimes = {}, {}, {}
+        # Record one entry and remember the directories to visit #
+        stack = [('', mtime)]
+        def record(relative, info):
+            entries[relative] = (info.st_size, info.st_mtime_ns,
+                                 info.st_ino, info.st_mode)
+            if stat.S_ISDIR(info.st_mode):
+                stack.append((relative, info.st_mtime_ns))
+        # Visit every directory #
+        while stack:
+            relative, dir_mtime = stack.pop()
+            directory = os.path.join(root, relative) if relative else root
+            prefix    = relative + '/' if relative else ''
+            # Unchanged directory, the names are known #
+            if known_mtimes.get(relative) == dir_mtime:
+                for name in names.get(relative, ()):
+                    child = prefix + name
+                    if fast and not stat.S_ISDIR(known[child][3]):
+                        entries[child] = known[child]
+                        continue
+                    try: info = os.lstat(os.path.join(directory, name))
+                    except FileNotFoundError: continue
+                    record(child, info)
+            # Changed or new directory, list it #
+            else:
+                try:
+                    with os.scandir(directory) as it: listing = list(it)
+                except OSError:
+                    continue
+                for entry in listing:
+                    try: info = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError: continue
+                    record(prefix + entry.name, info)
+        # Return #
+        return cls(root, mtime, entries, taken_at)
+
+    def children(self):
+        """The names inside every directory, by relative path."""
+        result = collections.defaultdict(list)
+        for relative in self.entries:
+            parent, _, name = relative.rpartition('/')
+            result[parent].append(name)
+        return result
+
+    def directory_mtimes(self):
+        """
+        The modification time of every directory, by relative path, the
+        root being ''. Directories modified just before the snapshot was
+        taken are left out, since they might have changed again within the
+        resolution of the clock.
+        """
+        result = {relative: info[1] for relative, info in self.entries.items()
+                  if stat.S_ISDIR(info[3])}
+        result[''] = self.root_mtime
+        if self.taken_at is None: return {}
+        limit = self.taken_at - racy_window
+        return {k: v for k, v in result.items() if v < limit}
+
+    #------------------------------- Comparing -------------------------------#
+    def diff(self, new):
+        """
+        Compare with a newer snapshot. Returns a named tuple with the sets
+        of relative paths that were `added`, `removed` and `modified`.
+        A directory is only modified if it was replaced or changed mode,
+        not just because its contents changed.
+        """
+        old_names, new_names = self.entries.keys(), new.entries.keys()
+        modified = set()
+        for relative in old_names & new_names:
+            before, after = self.entries[relative], new.entries[relative]
+            if before == after: continue
+            if stat.S_ISDIR(before[3]) and stat.S_ISDIR(after[3]) and \
+               before[2:] == after[2:]: continue
+            modified.add(relative)
+        return Diff(set(new_names - old_names), set(old_names - new_names),
+                    modified)
+
+    #-------------------------------- Storing --------------------------------#
+    def save(self, path):
+        """Write the snapshot to a compressed file, atomically."""
+        path = str(path)
+        temp = path + '.tmp'
+        data = {'root':       self.root,
+                'root_mtime': self.root_mtime,
+                'taken_at':   self.taken_at,
+                'entries':    [[k] + list(v) for k, v in self.entries.items()]}
+        with gzip.open(temp, 'wt', compresslevel=1) as handle:
+            json.dump(data, handle, separators=(',', ':'))
+        os.replace(temp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by `save`."""
+        with gzip.open(str(path), 'rt') as handle: data = json.load(handle)
+        entries = {e[0]: tuple(e[1:]) for e in data['entries']}
+        return cls(data['root'], data['root_mtime'], entries,
+                   data.get('taken_at'))
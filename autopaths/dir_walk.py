@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Internal modules #
+import autopaths
+
+# Constants #
+default_workers = 16
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+
+###############################################################################
+class WalkEntry(object):
+    """
+    A lightweight item yielded by `walk`. It wraps an `os.DirEntry`, so the
+    file type comes for free from the directory listing and the result of
+    `stat()` is cached after the first call.
+    """
+
+    __slots__ = ('entry', 'depth')
+
+    def __repr__(self):
+        return '<%s object "%s">' % (self.__class__.__name__, self.path)
+
+    def __init__(self, entry, depth):
+        self.entry = entry
+        self.depth = depth
+
+    @property
+    def path(self): return self.entry.path
+
+    @property
+    def name(self): return self.entry.name
+
+    def is_dir(self, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self): return self.entry.is_symlink()
+
+    def stat(self, follow_symlinks=True):
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+    def inode(self): return self.entry.inode()
+
+    def to_path(self):
+        """A `FilePath` or `DirectoryPath`, built without any cleaning."""
+        if self.is_dir():
+            return autopaths.dir_path.DirectoryPath.from_clean(self.path + sep)
+        return autopaths.file_path.FilePath.from_clean(self.path)
+
+###############################################################################
+def scan(directory, onerror=None):
+    """List a directory, calling `onerror` instead of raising."""
+    try:
+        with os.scandir(directory) as it: return list(it)
+    except OSError as error:
+        if onerror is not None: onerror(error)
+        return []
+
+def make_descend(top, max_depth=None, prune=None, follow_symlinks=False):
+    """
+    Return a function that decides if the walk should go inside a given
+    entry, remembering the visited directories when following links.
+    """
+    if follow_symlinks:
+        stat    = os.stat(top)
+        visited = {(stat.st_dev, stat.st_ino)}
+    def descend(item):
+        if not item.is_dir(): return False
+        if max_depth is not None and item.depth >= max_depth: return False
+        if item.is_symlink():
+            if not follow_symlinks: return False
+        if prune is not None and prune(item): return False
+        if follow_symlinks:
+            stat = item.stat()
+            key  = (stat.st_dev, stat.st_ino)
+            if key in visited: return False
+            visited.add(key)
+        return True
+    return descend
+
+def walk(top, topdown=True, max_depth=None, prune=None, follow_symlinks=False,
+         onerror=None):
+    """
+    Yield a `WalkEntry` for every file and directory below `top`, using a
+    single `os.scandir` call per directory.
+
+    * With `topdown`, directories are yielded before their contents,
+      otherwise after.
+    * Entries directly inside `top` have a depth of 1. Directories at
+      `max_depth` are yielded but not descended into.
+    * Directories for which `prune(entry)` returns True are yielded but not
+      descended into.
+    * Symbolic links to directories are only descended into with
+      `follow_symlinks`, in which case loops are detected.
+    * Errors, such as permission denied, are ignored unless an `onerror`
+      function is given.
+    """
+    top     = str(top).rstrip(sep) or sep
+    descend = make_descend(top, max_depth, prune, follow_symlinks)
+    # Top down, every directory is listed before its contents #
+    if topdown:
+        stack = [(top, 1)]
+        while stack:
+            directory, depth = stack.pop()
+            inside = []
+            for entry in scan(directory, onerror):
+                item = WalkEntry(entry, depth)
+                yield item
+                if descend(item): inside.append((entry.path, depth + 1))
+            stack.extend(reversed(inside))
+    # Bottom up, every directory is yielded when its contents are done #
+    else:
+        stack = [(iter(scan(top, onerror)), 1, None)]
+        while stack:
+            entries, depth, owner = stack[-1]
+            for entry in entries:
+                item = WalkEntry(entry, depth)
+                if descend(item):
+                    stack.append((iter(scan(entry.path, onerror)),
+                                  depth + 1, item))
+                    break
+                yield item
+            else:
+                stack.pop()
+                if owner is not None: yield owner
+
+###############################################################################
+def scan_typed(directory, onerror=None, follow_symlinks=False, lstat=False):
+    """
+    List a directory and find the type of every entry right away, so that
+    the extra system calls needed on filesystems that don't report types
+    in their listings (common on network storage) happen in the worker.
+    With `lstat`, the result of `stat(follow_symlinks=False)` is cached
+    in every entry too.
+    """
+    entries = scan(directory, onerror)
+    for entry in entries:
+        try:
+            if entry.is_dir() and follow_symlinks: entry.stat()
+            if lstat: entry.stat(follow_symlinks=False)
+        except OSError:
+            pass
+    return entries
+
+def parallel_walk(top, workers=default_workers, ordered=False,
+                  max_depth=None, prune=None, follow_symlinks=False,
+                  onerror=None, lstat=False):
+    """
+    Like a top-down `walk`, but directories are listed concurrently by a
+    pool of `workers` threads, which hides the latency of each listing on
+    network filesystems. The entries are still yielded by one generator.
+
+    * With `ordered`, entries come in exactly the same order as `walk`,
+      the listings of the next directories being fetched in advance.
+    * Otherwise, entries are yielded as soon as their directory has been
+      listed, which is faster.
+
+    At most `2 * workers` listings are in flight at any time. With `lstat`,
+    the workers also fetch `entry.stat(follow_symlinks=False)`.
+    """
+    top     = str(top).rstrip(sep) or sep
+    descend = make_descend(top, max_depth, prune, follow_symlinks)
+    ahead   = 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        submit = lambda path: ex.submit(scan_typed, path, onerror,
+                                        follow_symlinks, lstat)
+        # Same order as the serial walk #
+        if ordered:
+            stack = [[top, 1, None]]
+            try:
+                while stack:
+                    # Start listing the directories that come next #
+                    for waiting in stack[-1:-ahead - 1:-1]:
+                        if waiting[2] is None:
+                            waiting[2] = submit(waiting[0])
+                    directory, depth, future = stack.pop()
+                    inside = []
+                    for entry in future.result():
+                        item = WalkEntry(entry, depth)
+                        yield item
+                        if descend(item):
+                            inside.append([entry.path, depth + 1, None])
+                    stack.extend(reversed(inside))
+            finally:
+                for waiting in stack:
+                    if waiting[2] is not None: waiting[2].cancel()
+        # Whichever listing finishes first #
+        else:
+            pending = collections.deque([(top, 1)])
+            running = {}
+            try:
+                while pending or running:
+                    while pending and len(running) < ahead:
+                        directory, depth = pending.pop()
+                        running[submit(directory)] = depth
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        depth = running.pop(future)
+                        for entry in future.result():
+                            item = WalkEntry(entry, depth)
+                            yield item
+                            if descend(item):
+                                pending.append((entry.path, depth + 1))
+            finally:
+                for future in running: future.cancel()
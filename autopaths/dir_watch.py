@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, sys, stat, time, errno, ctypes, ctypes.util, struct, select
+import collections
+
+# Internal modules #
+import autopaths
+from autopaths.dir_walk import walk
+from autopaths.dir_snapshot import Snapshot
+
+# Constants #
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+
+# The inotify flags #
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR       = 0x40000000
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+watch_mask = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+              IN_ONLYDIR | IN_EXCL_UNLINK)
+header = struct.Struct('iIII')
+
+###############################################################################
+class Event(collections.namedtuple('Event', 'kind path is_dir dest')):
+    """
+    Something that happened in a watched directory. The `kind` is one of
+    'created', 'modified', 'moved', 'deleted', 'finished' (a file that
+    was closed after writing, or stopped changing) or 'overflow' (events
+    were lost, the directory should be scanned again). The `dest` is the
+    new path of moved items.
+    """
+
+    def __new__(cls, kind, path, is_dir=False, dest=None):
+        return super().__new__(cls, kind, path, is_dir, dest)
+
+    def to_path(self, path=None):
+        """The path of the event as a `FilePath` or `DirectoryPath`."""
+        path = self.path if path is None else path
+        if self.is_dir:
+            return autopaths.dir_path.DirectoryPath.from_clean(path + sep)
+        return autopaths.file_path.FilePath.from_clean(path)
+
+###############################################################################
+def load_inotify():
+    """The libc functions, or None when inotify is not available."""
+    if not sys.platform.startswith('linux'): return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    return libc
+
+class InotifyBackend(object):
+    """
+    Watch a directory tree with inotify. One watch is added per directory
+    and new sub-directories are watched as soon as they appear.
+    Renames inside the tree are reported as a single 'moved' event.
+    """
+
+    def __init__(self, root, recursive=True):
+        self.libc      = load_inotify()
+        self.root      = root
+        self.recursive = recursive
+        self.fd        = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0: self.raise_errno()
+        self.paths     = {}
+        self.add_tree(root)
+
+    def raise_errno(self):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+    def fileno(self): return self.fd
+
+    def close(self):
+        if self.fd is not None: os.close(self.fd)
+        self.fd = None
+
+    #------------------------------- Watches ---------------------------------#
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         watch_mask)
+        if wd < 0:
+            if ctypes.get_errno() in (errno.ENOENT, errno.ENOTDIR,
+                                      errno.EACCES): return
+            self.raise_errno()
+        self.paths[wd] = path
+
+    def add_tree(self, path):
+        """Watch a directory and, if recursive, everything below it."""
+        self.add_watch(path)
+        found = []
+        if not self.recursive: return found
+        for entry in walk(path):
+            is_dir = entry.is_dir(follow_symlinks=False)
+            found.append(Event('created', entry.path, is_dir))
+            if is_dir: self.add_watch(entry.path)
+        return found
+
+    def remove_tree(self, path):
+        """Stop watching a directory that left the tree."""
+        prefix = path + sep
+        for wd, watched in list(self.paths.items()):
+            if watched == path or watched.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.paths[wd]
+
+    def rename_tree(self, source, dest):
+        """Directories moved inside the tree keep their watches."""
+        prefix = source + sep
+        for wd, watched in list(self.paths.items()):
+            if watched == source: self.paths[wd] = dest
+            elif watched.startswith(prefix):
+                self.paths[wd] = dest + watched[len(source):]
+
+    #------------------------------- Reading ---------------------------------#
+    def read_raw(self, timeout):
+        """Wait for events and return the raw bytes, or b'' on timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready: return b''
+        try: return os.read(self.fd, 1 << 16)
+        except BlockingIOError: return b''
+
+    def read(self, timeout=None):
+        """Wait up to `timeout` seconds and return a list of events."""
+        events = []
+        moves  = {}
+        data   = self.read_raw(timeout)
+        while data:
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = header.unpack_from(data, offset)
+                name = data[offset + header.size:
+                            offset + header.size + length].rstrip(b'\0')
+                offset += header.size + length
+                events.extend(self.handle(wd, mask, cookie,
+                                          os.fsdecode(name), moves))
+            # The other half of a rename is probably just about to come #
+            data = self.read_raw(0.01) if moves else b''
+        # Items moved out of the tree are gone #
+        for path, is_dir in moves.values():
+            if is_dir: self.remove_tree(path)
+            events.append(Event('deleted', path, is_dir))
+        return events
+
+    def handle(self, wd, mask, cookie, name, moves):
+        """Translate one inotify event."""
+        if mask & IN_Q_OVERFLOW: return [Event('overflow', self.root, True)]
+        if mask & IN_IGNORED:
+            self.paths.pop(wd, None)
+            return []
+        directory = self.paths.get(wd)
+        if directory is None or not name: return []
+        path   = os.path.join(directory, name)
+        is_dir = bool(mask & IN_ISDIR)
+        if mask & IN_CREATE:
+            events = [Event('created', path, is_dir)]
+            if is_dir and self.recursive: events += self.add_tree(path)
+            return events
+        if mask & IN_MODIFY:      return [Event('modified', path, is_dir)]
+        if mask & IN_CLOSE_WRITE: return [Event('finished', path, is_dir)]
+        if mask & IN_DELETE:      return [Event('deleted', path, is_dir)]
+        if mask & IN_MOVED_FROM:
+            moves[cookie] = (path, is_dir)
+            return []
+        if mask & IN_MOVED_TO:
+            if cookie in moves:
+                source, _ = moves.pop(cookie)
+                if is_dir: self.rename_tree(source, path)
+                return [Event('moved', source, is_dir, path)]
+            events = [Event('created', path, is_dir)]
+            if is_dir and self.recursive: events += self.add_tree(path)
+            return events
+        return []
+
+###############################################################################
+class PollingBackend(object):
+    """
+    Watch a directory tree by taking snapshots at regular intervals and
+    comparing them. Thanks to the previous snapshot, directories that
+    didn't change are not listed again. Renames are recognized from the
+    inode numbers. Files are reported as 'finished' once their size and
+    mtime haven't changed for `settle` seconds.
+    """
+
+    def __init__(self, root, recursive=True, interval=1.0, settle=None):
+        self.root      = root
+        self.recursive = recursive
+        self.interval  = interval
+        self.settle    = 2 * interval if settle is None else settle
+        self.current   = self.take()
+        self.next_poll = time.monotonic() + interval
+        self.growing   = {}
+
+    def fileno(self): return None
+
+    def close(self): pass
+
+    def take(self, previous=None):
+        if self.recursive: return Snapshot.take(self.root, previous)
+        entries = {}
+        for entry in walk(self.root, max_depth=1):
+            try: info = entry.stat(follow_symlinks=False)
+            except OSError: continue
+            entries[entry.name] = (info.st_size, info.st_mtime_ns,
+                                   info.st_ino, info.st_mode)
+        return Snapshot(self.root, 0, entries)
+
+    def read(self, timeout=None):
+        """Wait up to `timeout` seconds and return a list of events."""
+        # Wait for the next poll #
+        wait = self.next_poll - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return []
+        if wait > 0: time.sleep(wait)
+        self.next_poll = time.monotonic() + self.interval
+        # Compare #
+        new    = self.take(self.current)
+        old    = self.current
+        events = self.compare(old, new)
+        self.current = new
+        return events + self.finished(new)
+
+    def compare(self, old, new):
+        """The events that explain the differences between snapshots."""
+        join   = lambda rel: os.path.join(self.root, rel)
+        is_dir = lambda info: stat.S_ISDIR(info[3])
+        added, removed, modified = old.diff(new)
+        events = []
+        # Renames keep the same inode #
+        inodes = {new.entries[rel][2]: rel for rel in added}
+        moved  = {}
+        for rel in sorted(removed, key=len):
+            info = old.entries[rel]
+            dest = inodes.get(info[2])
+            if dest is None: continue
+            moved[rel] = dest
+            added.discard(dest)
+            # Children of a moved directory are implied #
+            parent, dest_parent = os.path.dirname(rel), os.path.dirname(dest)
+            if moved.get(parent) == dest_parent and parent: continue
+            events.append(Event('moved', join(rel), is_dir(info), join(dest)))
+        removed -= set(moved)
+        # The rest #
+        for rel in sorted(added):
+            info = new.entries[rel]
+            events.append(Event('created', join(rel), is_dir(info)))
+        for rel in sorted(modified):
+            if is_dir(new.entries[rel]): continue
+            events.append(Event('modified', join(rel), False))
+        for rel in sorted(removed, reverse=True):
+            info = old.entries[rel]
+            events.append(Event('deleted', join(rel), is_dir(info)))
+        # Files that are being written #
+        now = time.monotonic()
+        for rel in added | modified:
+            info = new.entries[rel]
+            if not is_dir(info): self.growing[rel] = (info[:2], now)
+        return events
+
+    def finished(self, new):
+        """Files whose size and mtime stopped changing."""
+        events = []
+        now    = time.monotonic()
+        for rel, (signature, since) in list(self.growing.items()):
+            info = new.entries.get(rel)
+            if info is None:
+                del self.growing[rel]
+            elif info[:2] != signature:
+                self.growing[rel] = (info[:2], now)
+            elif now - since >= self.settle:
+                del self.growing[rel]
+                events.append(Event('finished',
+                                    os.path.join(self.root, rel), False))
+        return events
+
+###############################################################################
+class Watcher(object):
+    """
+    A stream of events happening below a directory. Iterate over it to
+    get the events as they come, or call `read(timeout)` to get the ones
+    available within a given time. Use it as a context manager, or call
+    `close()`, to release the inotify watches.
+
+    With `debounce`, events are held back until their path stayed quiet
+    for that many seconds, and bursts are merged: a file created then
+    modified is only reported as created, a file created then deleted is
+    not reported at all.
+    """
+
+    def __repr__(self):
+        return '<%s object on "%s" with %s>' % (self.__class__.__name__,
+               self.root, self.backend.__class__.__name__)
+
+    def __init__(self, root, recursive=True, debounce=0.0, interval=1.0,
+                 settle=None, backend='auto'):
+        self.root     = str(root).rstrip(sep) or sep
+        self.debounce = debounce
+        self.pending  = collections.OrderedDict()
+        self.closed   = False
+        # Pick the backend #
+        if backend == 'auto':
+            backend = 'inotify' if load_inotify() is not None else 'poll'
+        if backend == 'inotify':
+            self.backend = InotifyBackend(self.root, recursive)
+        elif backend == 'poll':
+            self.backend = PollingBackend(self.root, recursive, interval,
+                                          settle)
+        else:
+            raise Exception("Unrecognized watch backend '%s'." % backend)
+
+    def __enter__(self): return self
+
+    def __exit__(self, *args): self.close()
+
+    def __iter__(self):
+        while not self.closed:
+            for event in self.read(): yield event
+
+    def close(self):
+        self.closed = True
+        self.backend.close()
+
+    #------------------------------- Reading ---------------------------------#
+    def read(self, timeout=None):
+        """
+        Wait until some events are available, or `timeout` seconds, and
+        return them as a list (empty on timeout).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # How long can we wait #
+            wait = None if deadline is None else \
+                   max(deadline - time.monotonic(), 0)
+            if self.pending:
+                oldest = next(iter(self.pending.values()))[1]
+                until  = max(oldest + self.debounce - time.monotonic(), 0)
+                wait   = until if wait is None else min(wait, until)
+            # Get new events #
+            events = self.backend.read(wait)
+            if not self.debounce and events: return events
+            for event in events: self.add(event)
+            ready = self.release()
+            if ready: return ready
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+
+    #------------------------------ Debouncing -------------------------------#
+    def add(self, event):
+        """Merge an event with the pending ones on the same path."""
+        now = time.monotonic()
+        if event.kind in ('moved', 'overflow'):
+            self.pending[(event.path, event.kind)] = [event, now, False]
+            return
+        previous = self.pending.pop(event.path, None)
+        finished = False
+        if previous is not None:
+            old = previous[0]
+            if event.kind == 'finished':
+                event, finished = old, True
+            elif old.kind == 'created' and event.kind == 'modified':
+                event = old
+            elif old.kind == 'created' and event.kind == 'deleted':
+                return
+            elif old.kind == 'deleted' and event.kind == 'created':
+                event = event._replace(kind='modified')
+        self.pending[event.path] = [event, now, finished]
+
+    def release(self):
+        """The pending events that stayed quiet long enough."""
+        ready = []
+        limit = time.monotonic() - self.debounce
+        for key, (event, last, finished) in list(self.pending.items()):
+            if last > limit: continue
+            del self.pending[key]
+            ready.append(event)
+            if finished and event.kind != 'finished':
+                ready.append(event._replace(kind='finished'))
+        return ready
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, stat
+
+# Internal modules #
+from autopaths.dir_walk import parallel_walk, default_workers
+from autopaths.file_size import FileSize
+
+# Constants #
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+
+###############################################################################
+class Usage(object):
+    """
+    The disk usage of a directory:
+
+    * `apparent`, the sum of the sizes of all files (and links), like
+      `du --apparent-size` but without the directories themselves.
+    * `allocated`, the bytes actually allocated on disk for everything
+      including the directories, like `du`. Sparse and compressed files
+      are smaller here.
+    * `files` and `directories`, the number of each.
+    * `children`, a dictionary of the same objects for the sub-directories
+      when a breakdown was asked for.
+    """
+
+    __slots__ = ('apparent', 'allocated', 'files', 'directories', 'children')
+
+    def __repr__(self):
+        return '<%s object: %s apparent, %s allocated, %i files>' % \
+               (self.__class__.__name__, FileSize(self.apparent),
+                FileSize(self.allocated), self.files)
+
+    def __init__(self):
+        self.apparent    = 0
+        self.allocated   = 0
+        self.files       = 0
+        self.directories = 0
+        self.children    = {}
+
+    def add_stat(self, info):
+        """Account for one item."""
+        self.allocated += getattr(info, 'st_blocks', 0) * 512
+        if stat.S_ISDIR(info.st_mode):
+            self.directories += 1
+        else:
+            self.apparent += info.st_size
+            self.files    += 1
+
+    def add(self, other):
+        """Add the totals of a sub-directory."""
+        self.apparent    += other.apparent
+        self.allocated   += other.allocated
+        self.files       += other.files
+        self.directories += other.directories
+
+###############################################################################
+def disk_usage(path, workers=default_workers, breakdown=0, dedup=True,
+               follow_links=False):
+    """
+    Compute the disk usage of a directory, listing the directories on a
+    pool of `workers` threads which also perform the `lstat` calls.
+    Symbolic links are counted but not followed, unless `follow_links` is
+    set, in which case links to files count as the file they point to.
+    Links to directories are never descended into. With `dedup`, files
+    that have several hard links are only counted once.
+
+    With `breakdown`, the `children` attribute of the result is filled
+    recursively for that many levels of sub-directories.
+    Returns a `Usage` object.
+    """
+    top   = str(path).rstrip(sep) or sep
+    total = Usage()
+    total.add_stat(os.lstat(top))
+    seen  = set()
+    # Every directory that is part of the breakdown has its own usage #
+    nodes = {top: total}
+    # Walk #
+    for entry in parallel_walk(top, workers, lstat=True):
+        try: info = entry.stat(follow_symlinks=False)
+        except OSError: continue
+        # Symbolic links to files, broken ones keep their own size #
+        if follow_links and stat.S_ISLNK(info.st_mode):
+            try: target = entry.stat()
+            except OSError: target = None
+            if target is not None and not stat.S_ISDIR(target.st_mode):
+                info = target
+        # Hard links #
+        if dedup and info.st_nlink > 1 and not stat.S_ISDIR(info.st_mode):
+            key = (info.st_dev, info.st_ino)
+            if key in seen: continue
+            seen.add(key)
+        # Directories in the breakdown get a node #
+        is_dir = stat.S_ISDIR(info.st_mode)
+        if is_dir and entry.depth <= breakdown:
+            nodes[entry.path] = Usage()
+        # Account in the closest node #
+        if not breakdown: node = total
+        elif is_dir and entry.depth <= breakdown: node = nodes[entry.path]
+        else:
+            parent = os.path.dirname(entry.path)
+            while parent not in nodes: parent = os.path.dirname(parent)
+            node = nodes[parent]
+        node.add_stat(info)
+    # Sum the nodes bottom up #
+    for directory in sorted(nodes, key=len, reverse=True):
+        if directory == top: continue
+        node   = nodes[directory]
+        parent = nodes[os.path.dirname(directory)]
+        parent.add(node)
+        parent.children[os.path.basename(directory)] = node
+    # Return #
+    return total
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, stat, hashlib, tempfile, collections
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+import autopaths
+from autopaths.dir_walk import parallel_walk, default_workers
+from autopaths.checksums import checksums
+from autopaths.fast_copy import reflink
+from autopaths.bulk_ops import Outcome
+
+# Constants #
+block_size = 1 << 16
+
+###############################################################################
+def list_files(roots, workers=default_workers, min_size=1):
+    """
+    Find all regular files below the given directories that are at least
+    `min_size` bytes, grouped by size. Hard links to the same inode are
+    only listed once since they can't be duplicates of each other.
+    Returns a dictionary of size to a list of `(path, stat)`.
+    """
+    by_size = collections.defaultdict(list)
+    inodes  = set()
+    for root in roots:
+        for entry in parallel_walk(str(root), workers, lstat=True):
+            try: info = entry.stat(follow_symlinks=False)
+            except OSError: continue
+            if not stat.S_ISREG(info.st_mode): continue
+            if info.st_size < min_size: continue
+            key = (info.st_dev, info.st_ino)
+            if key in inodes: continue
+            inodes.add(key)
+            by_size[info.st_size].append((entry.path, info))
+    return by_size
+
+def edges_digest(path, size, block_size=block_size):
+    """A hash of the first and last blocks of a file."""
+    h = hashlib.md5()
+    with open(path, 'rb') as handle:
+        h.update(handle.read(block_size))
+        if size > block_size:
+            handle.seek(max(size - block_size, block_size))
+            h.update(handle.read(block_size))
+    return h.hexdigest()
+
+def regroup(groups, function, workers):
+    """
+    Split every group of `(path, stat)` by the result of `function(path,
+    size)` computed in parallel, and only keep the groups of two or more.
+    Files that can't be read anymore are dropped.
+    """
+    items = [item for group in groups for item in group]
+    def compute(item):
+        try: return function(item[0], item[1].st_size)
+        except OSError: return None
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        keys = list(ex.map(compute, items))
+    result = collections.defaultdict(list)
+    for item, key in zip(items, keys):
+        if key is not None: result[(item[1].st_size, key)].append(item)
+    return [group for group in result.values() if len(group) > 1]
+
+###############################################################################
+def group_duplicates(roots, workers=default_workers, min_size=1,
+                     algorithm='sha256', block_size=block_size, cache=True):
+    """
+    Find the files that have identical contents below one or several
+    directories, without hashing everything:
+
+    * Files are first grouped by size, which comes from the walk.
+    * Files of the same size are compared with a hash of their first and
+      last `block_size` bytes.
+    * Only the files still matching are hashed entirely with `algorithm`,
+      in parallel, with the checksum cache (see `autopaths.checksums`).
+
+    Returns a list of groups, each group being a sorted list of
+    `(path, stat)` tuples where `stat` comes from the walk, the largest
+    files first.
+    """
+    # Group by size #
+    if isinstance(roots, (str, os.PathLike)): roots = [roots]
+    by_size = list_files(roots, workers, min_size)
+    groups  = [group for group in by_size.values() if len(group) > 1]
+    # Group by the first and last blocks #
+    edges  = lambda path, size: edges_digest(path, size, block_size)
+    groups = regroup(groups, edges, workers)
+    # Group by the full contents #
+    full   = lambda path, size: checksums(path, (algorithm,), cache)[algorithm]
+    groups = regroup(groups, full, workers)
+    # Return #
+    groups = [sorted(group, key=lambda item: item[0]) for group in groups]
+    groups.sort(key=lambda group: (-group[0][1].st_size, group[0][0]))
+    return groups
+
+def find_duplicates(roots, **kwargs):
+    """
+    Same as `group_duplicates` but every group is a list of `FilePath`
+    objects. See `group_duplicates` for the options.
+    """
+    FilePath = autopaths.file_path.FilePath
+    return [[FilePath.from_clean(path) for path, info in group]
+            for group in group_duplicates(roots, **kwargs)]
+
+###############################################################################
+def link_in_place(source, destination, method='hardlink'):
+    """
+    Atomically replace `destination` by a hard link to `source`, or by a
+    reflink copy that shares the blocks of `source` on disk.
+    """
+    directory = os.path.dirname(destination)
+    fd, temp  = tempfile.mkstemp(dir=directory, prefix='.dedup.')
+    try:
+        if method == 'hardlink':
+            os.close(fd)
+            os.remove(temp)
+            os.link(source, temp)
+        elif method == 'reflink':
+            src_fd = os.open(source, os.O_RDONLY)
+            try: done = reflink(src_fd, fd)
+            finally:
+                os.close(src_fd)
+                os.close(fd)
+            if not done:
+                raise Exception("Reflinks are not supported for '%s'." %
+                                destination)
+            os.chmod(temp, stat.S_IMODE(os.stat(destination).st_mode))
+        else:
+            raise Exception("Unrecognized dedup method '%s'." % method)
+        os.replace(temp, destination)
+    except BaseException:
+        if os.path.lexists(temp): os.remove(temp)
+        raise
+
+def stamp_of(info):
+    """What must not change between the comparison and the replacement."""
+    return info.st_size, info.st_mtime_ns, info.st_ino
+
+def replace_duplicates(groups, method='hardlink', dry_run=False):
+    """
+    Keep the first file of every group and replace the others with hard
+    links or reflinks to it. The groups are the ones returned by
+    `group_duplicates`: files whose size, modification time or inode
+    changed since they were compared are skipped. Returns a list of
+    `Outcome` tuples with the kept file as `source` and the replaced one
+    as `destination`.
+    """
+    results = []
+    for group in groups:
+        keep, keep_info = group[0]
+        for other, info in group[1:]:
+            try:
+                for path, known in ((keep, keep_info), (other, info)):
+                    if stamp_of(os.lstat(path)) != stamp_of(known):
+                        raise Exception("The file '%s' changed." % path)
+                if not dry_run: link_in_place(keep, other, method)
+            except Exception as error:
+                results.append(Outcome(keep, other, error))
+            else:
+                results.append(Outcome(keep, other, None))
+    return results
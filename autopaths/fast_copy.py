@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, errno, shutil, stat, tempfile
+
+# Constants #
+buffer_size = 1 << 20
+chunk_size  = 1 << 30
+FICLONE     = 0x40049409
+fallback_errors = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                   errno.EOPNOTSUPP, errno.ENOTSUP, errno.EPERM,
+                   errno.ETXTBSY, errno.ENOTSOCK)
+
+###############################################################################
+def reflink(src_fd, dst_fd):
+    """
+    Try to make the destination share the blocks of the source with the
+    FICLONE ioctl (btrfs, xfs, ocfs2, ...). Returns True on success.
+    """
+    try: import fcntl
+    except ImportError: return False
+    try: fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError: return False
+    return True
+
+def copy_range(src_fd, dst_fd, src_offset, count, dst_offset):
+    """
+    Copy `count` bytes between two file descriptors at explicit offsets,
+    using the fastest kernel path available and falling back when the
+    kernel or filesystem does not support it:
+
+    * `os.copy_file_range` which never leaves kernel space and can even
+      be offloaded to the storage server on network filesystems.
+    * `os.sendfile` which avoids the copies to user space.
+    * Plain reads and writes through a large buffer.
+    """
+    # Kernel copy #
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while count > 0:
+                done = os.copy_file_range(src_fd, dst_fd,
+                                          min(count, chunk_size),
+                                          src_offset, dst_offset)
+                if done == 0: break
+                src_offset, dst_offset = src_offset + done, dst_offset + done
+                count -= done
+            if count <= 0: return
+        except OSError as error:
+            if error.errno not in fallback_errors: raise
+    # Sendfile uses the current position of the destination #
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+            while count > 0:
+                done = os.sendfile(dst_fd, src_fd, src_offset,
+                                   min(count, chunk_size))
+                if done == 0: break
+                src_offset, dst_offset = src_offset + done, dst_offset + done
+                count -= done
+            if count <= 0: return
+        except OSError as error:
+            if error.errno not in fallback_errors: raise
+    # User space copy #
+    os.lseek(src_fd, src_offset, os.SEEK_SET)
+    os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+    while count > 0:
+        data = os.read(src_fd, min(count, buffer_size))
+        if not data: break
+        view = memoryview(data)
+        while view: view = view[os.write(dst_fd, view):]
+        count -= len(data)
+
+def data_segments(fd, size):
+    """
+    Yield the `(offset, length)` of the regions of a file that actually
+    contain data, skipping the holes of sparse files. When the platform
+    can't tell us where the holes are, the whole file is one segment.
+    """
+    if not hasattr(os, 'SEEK_DATA'):
+        if size: yield 0, size
+        return
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as error:
+            # No more data after this point #
+            if error.errno == errno.ENXIO: return
+            # Not supported by this filesystem #
+            yield offset, size - offset
+            return
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        if end > start: yield start, end - start
+        offset = end
+
+def copy_fd(src_fd, dst_fd, dst_offset=0, sparse=True):
+    """Copy a whole file at a given offset of another one, keeping holes."""
+    size = os.fstat(src_fd).st_size
+    if sparse: segments = data_segments(src_fd, size)
+    else:      segments = [(0, size)] if size else []
+    for start, length in segments:
+        copy_range(src_fd, dst_fd, start, length, dst_offset + start)
+    # Trailing holes must still count in the size #
+    if sparse: os.ftruncate(dst_fd, max(os.fstat(dst_fd).st_size,
+                                        dst_offset + size))
+    return size
+
+def check_not_same(info, source, destination):
+    """
+    Raise `shutil.SameFileError` if `destination` is the file described by
+    the stat result `info`, which would otherwise be truncated before
+    being read.
+    """
+    try: other = os.stat(destination)
+    except FileNotFoundError: return
+    if (info.st_dev, info.st_ino) == (other.st_dev, other.st_ino):
+        msg = "'%s' and '%s' are the same file" % (source, destination)
+        raise shutil.SameFileError(msg)
+
+###############################################################################
+def copy_file(source, destination, reflinks=True, sparse=True,
+              metadata=True):
+    """
+    Copy a file using the fastest method available: a reflink when the
+    filesystem supports it, else a kernel copy that keeps the holes of
+    sparse files. With `metadata`, behaves like `shutil.copy2`.
+    """
+    # Like `cp`, copying to a directory puts it inside #
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    # Open both sides #
+    src_fd = os.open(source, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        check_not_same(os.fstat(src_fd), source, destination)
+        flags  = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        dst_fd = os.open(destination, flags | getattr(os, 'O_BINARY', 0),
+                         stat.S_IMODE(os.fstat(src_fd).st_mode))
+        try:
+            if not (reflinks and reflink(src_fd, dst_fd)):
+                copy_fd(src_fd, dst_fd, 0, sparse)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    # Permissions and times #
+    if metadata: shutil.copystat(source, destination)
+    else:        shutil.copymode(source, destination)
+    return destination
+
+def concat_files(sources, destination, append=False, sparse=True):
+    """
+    Concatenate several files into one, without the data ever going through
+    python memory when the kernel can avoid it. With `append` the sources
+    are added at the end of the destination instead of replacing it.
+    """
+    sources = list(sources)
+    for source in sources: check_not_same(os.stat(source), source, destination)
+    flags  = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+    if not append: flags |= os.O_TRUNC
+    dst_fd = os.open(destination, flags, 0o666)
+    try:
+        offset = os.fstat(dst_fd).st_size
+        for source in sources:
+            src_fd = os.open(source, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            try: offset += copy_fd(src_fd, dst_fd, offset, sparse)
+            finally: os.close(src_fd)
+    finally:
+        os.close(dst_fd)
+    return destination
+
+def prepend_file(path, data, encoding='utf-8'):
+    """
+    Put some data (a string, bytes or a path object such as a `FilePath`)
+    in front of a file. The result is built in a temporary file in the same
+    directory and then atomically replaces the original, keeping its
+    permissions.
+    """
+    # Paths #
+    path      = str(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix    = '.' + os.path.basename(path) + '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix='.tmp',
+                                    dir=directory)
+    try:
+        # Another file #
+        if hasattr(data, 'path') or isinstance(data, os.PathLike):
+            os.close(fd)
+            concat_files([data, path], tmp_path)
+        # Some text #
+        else:
+            if isinstance(data, str): data = data.encode(encoding)
+            with open(fd, 'wb') as handle: handle.write(data)
+            concat_files([path], tmp_path, append=True)
+        # Switch the files around #
+        os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    return path
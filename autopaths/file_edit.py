@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, re, stat, tempfile
+
+###############################################################################
+class FileEdit(object):
+    """
+    A transaction that queues several edits to a text file and then applies
+    them all in a single streaming pass. Use it like this:
+
+        >>> with path.edit() as edit:
+        ...     edit.replace_word('alpha', 'beta')
+        ...     edit.remove_line('# Comment')
+        ...     edit.prepend('# Header\\n')
+
+    The edits are applied when the `with` block exits without error, or when
+    you call `commit()`. The result is written to a temporary file in the
+    same directory that then atomically replaces the original with
+    `os.replace`, so that readers never see a half-written file and the
+    original permissions are kept.
+
+    Line numbers passed to `insert_line`, `delete_line` and `set_line`
+    always refer to the lines of the original file, starting at zero.
+    Edits that act on line contents are applied in the order they were
+    queued.
+    """
+
+    def __repr__(self):
+        msg = '<%s object on "%s" with %i edits>'
+        return msg % (self.__class__.__name__, self.path, len(self.edits))
+
+    def __init__(self, path, encoding='utf-8'):
+        # Attributes #
+        self.path     = path
+        self.encoding = encoding
+        # The queue #
+        self.head    = []
+        self.tail    = []
+        self.edits   = []
+        self.inserts = {}
+        self.checks  = []
+
+    def __enter__(self): return self
+
+    def __exit__(self, err_type, value, traceback):
+        if err_type is None: self.commit()
+
+    #----------------------------- Substitutions -----------------------------#
+    def replace_word(self, word_to_find, replacement_word, count=-1):
+        """Replace every occurrence of a literal string in every line."""
+        self.edits.append(lambda n, l: [l.replace(word_to_find,
+                                                  replacement_word, count)])
+        return self
+
+    def regex_replace(self, pattern, replacement, count=0, flags=0):
+        """Replace the matches of a regular expression in every line."""
+        regex = re.compile(pattern, flags)
+        self.edits.append(lambda n, l: [regex.sub(replacement, l, count)])
+        return self
+
+    def sed_replace(self, before, after):
+        """
+        Like `sed -i 's/before/after/'`, replace the first match on every
+        line. The pattern is a python regular expression.
+        """
+        return self.regex_replace(before, after, count=1)
+
+    #-------------------------------- Lines ----------------------------------#
+    def replace_line(self, line_to_remove, line_to_insert, safe=False):
+        """
+        Replace every line equal to `line_to_remove` (trailing whitespace
+        is ignored) with another line. Unless `safe` is True, the whole
+        transaction fails if the line is never found.
+        """
+        # Check the line endings #
+        target = line_to_remove.strip('\n').rstrip()
+        insert = line_to_insert.strip('\n').rstrip() + '\n'
+        found  = []
+        # The edit #
+        def edit(n, line):
+            if line.rstrip() != target: return [line]
+            found.append(n)
+            return [insert]
+        self.edits.append(edit)
+        # The check at the end #
+        if not safe:
+            msg = "The line to replace ('%s') was not found in '%s'"
+            self.checks.append((found, msg % (target, self.path)))
+        return self
+
+    def remove_line(self, line_to_remove):
+        """Remove every line equal to a given line."""
+        # Check there is something to remove #
+        assert line_to_remove
+        target = line_to_remove.rstrip('\r\n')
+        self.edits.append(lambda n, l: [] if l.rstrip('\r\n') == target
+                                       else [l])
+        return self
+
+    def delete_line(self, number):
+        """Remove the line at a given position."""
+        self.edits.append(lambda n, l: [] if n == number else [l])
+        return self
+
+    def remove_first_line(self):
+        """Remove the first line of the file."""
+        return self.delete_line(0)
+
+    def set_line(self, number, text):
+        """Replace the line at a given position with some other text."""
+        if not text.endswith('\n'): text += '\n'
+        self.edits.append(lambda n, l: [text] if n == number else [l])
+        return self
+
+    def insert_line(self, number, text):
+        """
+        Insert a line before the line at a given position. A position
+        past the end of the file inserts the line at the end.
+        """
+        if not text.endswith('\n'): text += '\n'
+        self.inserts.setdefault(number, []).append(text)
+        return self
+
+    def prepend(self, text):
+        """Add some text at the very start of the file."""
+        self.head.append(text)
+        return self
+
+    def append(self, text):
+        """Add some text at the very end of the file."""
+        self.tail.append(text)
+        return self
+
+    #-------------------------------- Commit ---------------------------------#
+    def new_lines(self, handle):
+        """Generate the new contents of the file, in a single pass."""
+        # The start #
+        for text in self.head: yield text
+        # Every line #
+        n = -1
+        for n, line in enumerate(handle):
+            for text in self.inserts.get(n, ()): yield text
+            lines = [line]
+            for edit in self.edits:
+                lines = [new for old in lines for new in edit(n, old)]
+            for new in lines: yield new
+        # Inserts past the end #
+        for number in sorted(k for k in self.inserts if k > n):
+            for text in self.inserts[number]: yield text
+        # The end #
+        for text in self.tail: yield text
+
+    def commit(self):
+        """Apply all queued edits and atomically replace the file."""
+        # Nothing to do #
+        if not (self.head or self.tail or self.edits or self.inserts):
+            return self.path
+        # Paths #
+        path      = str(self.path)
+        directory = os.path.dirname(os.path.abspath(path))
+        prefix    = '.' + os.path.basename(path) + '.'
+        # The temporary file is on the same filesystem #
+        fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix='.tmp',
+                                        dir=directory)
+        try:
+            # Write the new contents #
+            with open(fd, 'w', encoding=self.encoding, newline='') as o:
+                with open(path, 'r', encoding=self.encoding, newline='') as i:
+                    o.writelines(self.new_lines(i))
+            # Abort if some required edits did not happen #
+            for found, msg in self.checks:
+                if not found: raise Exception(msg)
+            # Keep the permissions #
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            # Switch the files around #
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        # Empty the queue #
+        self.__init__(self.path, self.encoding)
+        return self.path
@@ -8,12 +8,26 @@ Contact at www.sinclair.bio
 """
 
 # Built-in modules #
-import os, tempfile, subprocess, shutil, gzip, zipfile, hashlib
+import os, tempfile, subprocess, shutil, gzip, zipfile
 
 # Internal modules #
 import autopaths
 from autopaths.common import pad_extra_whitespace
 from autopaths.tmp_path import new_temp_file
+from autopaths.line_count import count_lines, is_gzipped
+from autopaths.checksums import checksums
+from autopaths.parallel_gzip import parallel_gzip
+from autopaths.gzip_index import GzipIndex, iter_gunzip, last_lines
+from autopaths.file_edit import FileEdit
+from autopaths.fast_copy import copy_file, concat_files, prepend_file
+from autopaths.line_view import LineView
+from autopaths.file_shards import shard_ranges, split_file
+from autopaths.sniff import sniff
+from autopaths.compressed_io import open_decompressed
+from autopaths.compression import compress_file, decompress_file
+from autopaths.archive_extract import extract_zip, extract_tar
+from autopaths.archive_members import iter_members, open_member
+from autopaths.archive_members import table_of_contents, top_level_names
 
 # Constants #
 if os.name == "posix": sep = "/"
@@ -40,7 +54,7 @@ class FilePath(autopaths.base_path.BasePath):
     def __bool__(self): return self.path is not None and self.count_bytes != 0
 
     def __iter__(self):
-        with open(self.path, 'r', encoding='utf-8') as handle:
+        with open_decompressed(self.path, 'r', encoding='utf-8') as handle:
             for line in handle: yield line
 
     def __len__(self):
@@ -70,7 +84,7 @@ class FilePath(autopaths.base_path.BasePath):
     @property
     def first(self):
         """Just the first line. Don't try this on binary files."""
-        with open(self.path, 'r') as handle:
+        with open_decompressed(self.path, 'r') as handle:
             for line in handle: return line
 
     @property
@@ -111,15 +125,11 @@ class FilePath(autopaths.base_path.BasePath):
 
     @property
     def count(self):
-        """We are going to default to the number of lines."""
-        # Third party modules #
-        if os.name == "posix": import sh
-        if os.name == "nt":    import pbs3
-        # Count lines #
-        if os.name == "posix":
-            return int(sh.wc('-l', self.path).split()[0])
-        if os.name == "nt":
-            return int(pbs3.Command("find")('/c', '/v', '""', self.path))
+        """
+        We are going to default to the number of lines.
+        Compressed files are decompressed on the fly.
+        """
+        return count_lines(self.path)
 
     @property
     def size(self):
@@ -128,34 +138,46 @@ class FilePath(autopaths.base_path.BasePath):
 
     @property
     def contents(self):
-        """The contents as a string."""
-        with open(self.path, 'r') as handle: return handle.read()
+        """
+        The contents as a string.
+        Compressed files are decompressed on the fly.
+        """
+        with open_decompressed(self.path, 'r') as handle: return handle.read()
 
     @property
     def contents_utf8(self):
         """The contents as a unicode string."""
-        with open(self.path, encoding='utf8') as handle:return handle.read()
+        with open_decompressed(self.path, encoding='utf8') as handle:
+            return handle.read()
 
     @property
     def md5(self):
-        """Compute the md5 of a file. Pretty fast."""
-        md5 = hashlib.md5()
-        with open(self.path, "rb") as f:
-            for block in iter(lambda: f.read(4096), b""):
-                md5.update(block)
-        return md5.hexdigest()
+        """
+        Compute the md5 of a file. Pretty fast.
+        The result is memoized on disk, see `self.checksums`.
+        """
+        return self.checksums('md5')['md5']
 
     @property
     def might_be_binary(self):
         """Try to quickly guess if the file is binary."""
-        from binaryornot.check import is_binary
-        return is_binary(self.path)
+        return self.sniff().binary
 
     @property
     def contains_binary(self):
-        """Return True if the file contains binary characters."""
-        from binaryornot.helpers import is_binary_string
-        return is_binary_string(self.contents)
+        """
+        Return True if the file contains binary characters.
+        Only a bounded sample of the file is read, see `self.sniff`.
+        """
+        return self.sniff().binary
+
+    @property
+    def compression(self):
+        """
+        The compression or archive format detected from the magic number
+        such as 'gzip', 'bz2', 'xz', 'zstd', 'zip' or 'tar'. None otherwise.
+        """
+        return self.sniff().compression
 
     @property
     def magic_number(self):
@@ -165,12 +187,32 @@ class FilePath(autopaths.base_path.BasePath):
     @property
     def lines(self):
         """Get all lines in a list with \n striped."""
-        with open(self.path, 'r', encoding='utf-8') as handle:
+        with open_decompressed(self.path, 'r', encoding='utf-8') as handle:
             return [line.strip('\n') for line in handle]
 
+    def sniff(self, **kwargs):
+        """
+        Classify the contents of the file by reading a sample at its start
+        and at a few random offsets. Returns a named tuple with the fields
+        `binary`, `encoding` and `compression`. Results are cached per
+        inode and modification time. See `autopaths.sniff.sniff`.
+        """
+        return sniff(self.path, **kwargs)
+
+    def line_view(self, save=False, encoding='utf-8'):
+        """
+        A lazy view of the lines of the file, backed by a memory map and an
+        array of line offsets. It supports `len()`, indexing, slicing and
+        `reversed()` without reading the whole file in memory. With `save`,
+        the offsets are streamed to a sidecar file, memory mapped from
+        it, and reused next time.
+        """
+        return LineView(self.path, encoding=encoding, save=save)
+
     #-------------------------------- Methods --------------------------------#
     def read(self, encoding=None):
-        with open(self.path, 'r', encoding) as handle: content = handle.read()
+        with open_decompressed(self.path, 'r', encoding=encoding) as handle:
+            content = handle.read()
         return content
 
     def create(self):
@@ -182,8 +224,15 @@ class FilePath(autopaths.base_path.BasePath):
         """Just create an empty file if it does not exist."""
         with open(self.path, 'a'): os.utime(self.path, None)
 
-    def open(self, mode='r'):
-        self.handle = open(self.path, mode)
+    def open(self, mode='r', decompress=True, **kwargs):
+        """
+        Open the file and keep the handle. When reading, gzip, bz2, xz and
+        zstd files are detected and decompressed while streaming in a
+        background thread, unless you pass `decompress=False`.
+        """
+        if decompress: self.handle = open_decompressed(self.path, mode,
+                                                       **kwargs)
+        else:          self.handle = open(self.path, mode, **kwargs)
         return self.handle
 
     def add_str(self, string):
@@ -211,12 +260,37 @@ class FilePath(autopaths.base_path.BasePath):
         os.remove(self.path)
         return True
 
-    def copy(self, path):
-        """Copy to a different path."""
+    def copy(self, path, **kwargs):
+        """
+        Copy to a different path. Uses reflinks or kernel copies when
+        available and keeps the holes of sparse files.
+        See `autopaths.fast_copy.copy_file` for the options.
+        """
         # Directory special case #
         if path.endswith(sep): path += self.filename
         # Normal case #
-        shutil.copy2(self.path, path)
+        copy_file(self.path, path, **kwargs)
+
+    def count_lines(self, **kwargs):
+        """
+        Same as `self.count` but lets you tune the counting engine.
+        See `autopaths.line_count.count_lines` for the options.
+        """
+        return count_lines(self.path, **kwargs)
+
+    def checksums(self, *algorithms, cache=True, **kwargs):
+        """
+        Compute several digests of the file in a single pass. For instance:
+
+            >>> path.checksums('md5', 'sha256')
+            {'md5': '...', 'sha256': '...'}
+
+        Results are memoized in an on-disk cache keyed by the device, inode,
+        size and modification time of the file, so an unchanged file is never
+        hashed twice. See `autopaths.checksums` for the other options.
+        """
+        if not algorithms: algorithms = ('md5',)
+        return checksums(self.path, algorithms, cache=cache, **kwargs)
 
     def execute(self):
         return subprocess.call([self.path])
@@ -242,7 +316,10 @@ class FilePath(autopaths.base_path.BasePath):
             raise Exception("The file path '%s' does not exist." % self.path)
 
     def head(self, num_lines=20):
-        """Yield the first few lines."""
+        """
+        Yield the first few lines.
+        Compressed files are decompressed on the fly.
+        """
         lines = iter(self)
         for _ in range(num_lines): yield next(lines)
 
@@ -251,7 +328,22 @@ class FilePath(autopaths.base_path.BasePath):
         return "\n" + pad_extra_whitespace("\n".join(self.head()), 4) + "\n"
 
     def tail(self, num_lines=20, encoding='utf-8'):
-        """Yield the last few lines of the file."""
+        """
+        Yield the last few lines of the file.
+        For gzipped files, the random access index is used if it was
+        built already (see `self.gzip_index`), otherwise the file is
+        decompressed once in a streaming fashion. No sidecar is written.
+        """
+        # Compressed case #
+        if is_gzipped(self.path):
+            index = GzipIndex.load(self.path)
+            if index is not None: lines = index.tail(num_lines, encoding)
+            else:
+                with open(self.path, 'rb') as handle:
+                    data, _ = last_lines(iter_gunzip(handle), num_lines)
+                lines = [l.decode(encoding) for l in list(data)[-num_lines:]]
+            for line in lines: yield line
+            return
         # Constant #
         buffer_size = 1024
         # Smart algorithm #
@@ -310,25 +402,69 @@ class FilePath(autopaths.base_path.BasePath):
         # Update the internal link #
         self.path = path
 
+    #------------------------------- Sharding --------------------------------#
+    def shard_ranges(self, num_shards, record_start=None):
+        """
+        Partition the file into about equal byte ranges aligned on line
+        starts, without reading the whole file. To align on records, pass
+        the bytes every record starts with (e.g. b'>' for FASTA) or a
+        function such as `autopaths.file_shards.fastq_record_start`.
+        Returns a list of `(start, end)` tuples.
+        """
+        return shard_ranges(self.path, num_shards, record_start)
+
+    def split_to(self, directory, num_shards, record_start=None,
+                 workers=None):
+        """
+        Split the file into `num_shards` physical files placed in a given
+        directory, written in parallel. See `self.shard_ranges`.
+        """
+        paths = split_file(self.path, directory, num_shards, record_start,
+                           workers)
+        return [FilePath(path) for path in paths]
+
     #---------------------------- GZIP compression ---------------------------#
-    def gzip_to(self, new_path=None, remove_orig=False, method='prll'):
+    def gzip_to(self, new_path=None, remove_orig=False, method='auto',
+                level=6, **kw):
         """
         Make a gzipped version of the file at a given path.
         If the path already contains `.gz` and you want to compress inplace,
         just specify `new_path=False`.
+
+        The `method` can be one of:
+        * 'prll' for parallel blocks compressed on a thread pool.
+        * 'pigz' for the external `pigz` program.
+        * 'ext' for the external `gzip` program.
+        * 'internal' for a single threaded python stream.
+        * 'auto' for `pigz` when it is installed and `prll` otherwise,
+          or always `prll` when `block_size` or `buffer_size` is given.
+        Extra keyword arguments such as `block_size` and `workers` are passed
+        to the `prll` method, only `workers` is understood by `pigz`.
         """
+        # Default value #
+        in_place = False
         # Case where the path is not specified #
         if new_path is None:
             new_path = self.path + '.gz'
-        # In case we want to do it in place #
+        # In case we want to do it in place, stay on the same filesystem #
         if new_path is False:
             remove_orig = True
             in_place = True
-            new_path = new_temp_file(prefix='gzip_to-')
+            new_path = new_temp_file(prefix='gzip_to-', dir=self.directory)
+        # Pick the fastest method available #
+        blocks = set(kw) - {'workers'}
+        if method == 'auto':
+            method = 'prll' if blocks else self.fastest_gzip_method()
+        # Options that only our parallel blocks understand #
+        if method != 'prll' and (blocks or (method != 'pigz' and kw)):
+            msg = "The gzip method '%s' doesn't accept the options %s."
+            raise Exception(msg % (method, sorted(kw)))
         # Do it the fast way or the slow way #
-        if method == 'ext':  self.gzip_external(new_path)
-        if method == 'pigz': self.gzip_pigz(new_path)
-        else:                self.gzip_internal(new_path)
+        if   method == 'prll':     self.gzip_parallel(new_path, level, **kw)
+        elif method == 'pigz':     self.gzip_pigz(new_path, level, **kw)
+        elif method == 'ext':      self.gzip_external(new_path, level)
+        elif method == 'internal': self.gzip_internal(new_path, level)
+        else: raise Exception("Unrecognized gzip method '%s'." % method)
         # Move the temporary file back #
         if in_place:
             new_path.move_to(self.path, overwrite=True)
@@ -340,24 +476,40 @@ class FilePath(autopaths.base_path.BasePath):
         # Return #
         return self.path
 
-    def gzip_internal(self, new_path):
+    @staticmethod
+    def fastest_gzip_method():
+        """Use `pigz` if it is available, otherwise our own parallel blocks."""
+        if shutil.which('pigz') is None: return 'prll'
+        try: import sh
+        except ImportError: return 'prll'
+        return 'pigz'
+
+    def gzip_parallel(self, new_path, level=6, **kwargs):
+        """
+        Do the compression internally, but compress independent blocks with
+        `zlib` on a pool of threads. The result is a multi-member gzip file.
+        """
+        parallel_gzip(self.path, new_path, level, **kwargs)
+
+    def gzip_internal(self, new_path, level=9):
         """
         Do the compression internally with python buffers and no external
         process.
         """
-        with gzip.open(new_path, 'wb') as handle:
-            shutil.copyfileobj(self.open('rb'), handle)
+        with open(self.path, 'rb') as orig_handle:
+            with gzip.open(new_path, 'wb', compresslevel=level) as handle:
+                shutil.copyfileobj(orig_handle, handle)
 
-    def gzip_external(self, new_path):
+    def gzip_external(self, new_path, level=6):
         """
         Do the compression with an external shell command call.
         We don't want python to be buffering the text for speed.
         """
-        cmd = 'gzip --stdout %s > %s' % (self.path, new_path)
+        cmd = 'gzip -%i --stdout %s > %s' % (level, self.path, new_path)
         result = subprocess.check_output(cmd, shell=True)
         return result
 
-    def gzip_pigz(self, new_path):
+    def gzip_pigz(self, new_path, level=6, workers=None):
         """
         Do the compression with multiple threads. Possible projects:
         * https://github.com/madler/pigz (we choose this one)
@@ -368,6 +520,8 @@ class FilePath(autopaths.base_path.BasePath):
         pigz = sh.Command("pigz")
         # Command line options #
         options = {'keep': True}
+        arguments = ['-%i' % level]
+        if workers: arguments += ['-p', str(workers)]
         # It will refuse to compress files ending in '.gz' #
         if self.path.endswith('.gz'):
             working_path = self + '.pigz'
@@ -375,7 +529,7 @@ class FilePath(autopaths.base_path.BasePath):
         else:
             working_path = self
         # Run it #
-        pigz(working_path, **options)
+        pigz(*arguments, working_path, **options)
         # Restore the original file if the '.pigz' extension was added
         # to it earlier.
         if self.path.endswith('.gz'):
@@ -386,6 +540,20 @@ class FilePath(autopaths.base_path.BasePath):
         if out_path != new_path:
             out_path.move_to(new_path, overwrite=True)
 
+    def gzip_index(self, save=True, **kwargs):
+        """
+        Get the random access index of this gzip file. It is loaded from its
+        sidecar file if it is still current, otherwise it is built by
+        decompressing the file once and saved for next time.
+        With it, you can do things like:
+
+            >>> index = path.gzip_index()
+            >>> index.read(offset=10**9, size=100)
+            >>> list(index.lines(1000, 1004))
+            >>> index.tail(8)
+        """
+        return GzipIndex.get(self.path, save=save, **kwargs)
+
     def ungzip_to(self, path=None, mode='wb', method='ext'):
         """Make an ungzipped version of the file at a given path."""
         # Case where path is not specified #
@@ -406,71 +574,116 @@ class FilePath(autopaths.base_path.BasePath):
         result = subprocess.check_output(cmd, shell=True)
         return result
 
+    #--------------------------- Any compression -----------------------------#
+    def compress_to(self, path=None, format='gzip', level=None, workers=None,
+                    remove_orig=False, **kwargs):
+        """
+        Make a compressed version of the file at a given path, in one of the
+        formats 'gzip', 'bz2', 'xz' or 'zip'. The gzip, bz2 and xz formats
+        compress independent chunks in parallel on several `workers`.
+        See `autopaths.compression.compress_file` for the other options.
+        Returns the new file.
+        """
+        path = compress_file(self.path, path, format, level, workers, **kwargs)
+        if remove_orig: self.remove()
+        return FilePath(path)
+
+    def decompress_to(self, path=None, remove_orig=False, **kwargs):
+        """
+        Make a decompressed version of the file at a given path. The format
+        is detected from the magic number. Returns the new file.
+        """
+        path = decompress_file(self.path, path, **kwargs)
+        if remove_orig: self.remove()
+        return FilePath(path)
+
     #---------------------------- ZIP compression ----------------------------#
-    def zip_to(self, path=None):
+    def zip_to(self, path=None, level=None):
         """Make a zipped version of the file at a given path."""
-        pass
+        return self.compress_to(path, 'zip', level)
 
-    def unzip_to(self, path=None, inplace=False, single=True):
+    def unzip_to(self, path=None, inplace=False, single=True, select=None,
+                 workers=None):
         """
         Unzip a standard zip file. Can specify the destination of the
         uncompressed file, or just set inplace=True to delete the original.
+
+        With `single=False`, all members are extracted to the directory
+        `path` (by default the name of the zip file without its extension).
+        Member names are checked so that nothing is ever written outside of
+        that directory, and members are decompressed concurrently on a pool
+        of `workers` threads. Pass `select` (a list of glob patterns or a
+        function) to extract only some members.
         """
+        # Multifile #
+        if not single:
+            if path is None:
+                if self.path.endswith('.zip'): path = self.path[:-4]
+                else:                          path = self.path + '.unzip'
+            extract_zip(self.path, path, select, workers)
+            if inplace: self.remove()
+            return autopaths.dir_path.DirectoryPath(path)
         # Parse the path #
         path = autopaths.Path(path)
         # Check #
         assert zipfile.is_zipfile(self.path)
         # Load #
         z = zipfile.ZipFile(self.path)
-        if single or inplace: assert len(z.infolist()) == 1
+        assert len(z.infolist()) == 1
         # Single file #
-        if single:
-            member = z.infolist()[0]
-            tmpdir = tempfile.mkdtemp() + sep
-            z.extract(member, tmpdir)
-            z.close()
-            if inplace: shutil.move(tmpdir + member.filename,
-                                    self.directory + member.filename)
-            else:       shutil.move(tmpdir + member.filename,
-                                    path)
-        # Multifile - no security, dangerous - Will use CWD if dest is None!!
-        # If a file starts with an absolute path, will overwrite your files
-        # anywhere
-        if not single:
-            z.extractall(path)
-            return autopaths.dir_path.DirectoryPath(path)
+        member = z.infolist()[0]
+        tmpdir = tempfile.mkdtemp() + sep
+        z.extract(member, tmpdir)
+        z.close()
+        if inplace: shutil.move(tmpdir + member.filename,
+                                self.directory + member.filename)
+        else:       shutil.move(tmpdir + member.filename,
+                                path)
         # Return #
         return FilePath(path)
 
     #---------------------------- TAR compression ----------------------------#
-    def untar_to(self, path=None):
+    def untar_to(self, path=None, select=None):
         """Make an untared version of the file at a given path."""
-        return self.untargz_to(path, 'r', 'internal')
+        return self.untargz_to(path, 'r', 'internal', select)
 
-    def untargz_to(self, path=None, mode='r:gz', method='ext'):
-        """Make an untargzipped version of the file at a given path."""
+    def untargz_to(self, path=None, mode='r:gz', method='internal',
+                   select=None):
+        """
+        Make an untargzipped version of the file at a given path.
+
+        The 'internal' method streams the archive once, decompressing it in
+        a background thread while the members are written, and refuses
+        members that would end up outside of `path`. The compression is
+        detected from the magic number, so `mode` only matters for
+        the 'ext' method which calls the `tar` executable.
+        Pass `select` (a list of glob patterns or a function) to extract
+        only some members.
+        """
         # Case where path is not specified #
         if path is None:
             if   self.path.endswith('.tgz'):    path = self.path[:-4]
             elif self.path.endswith('.tar.gz'): path = self.path[:-7]
             else: path = self.path + '.untargz'
         # Do it the fast way or the slow way #
-        if method == 'ext': self.untargz_to_external(path)
-        else:               self.untargz_to_internal(path, mode)
+        if method == 'ext':
+            if select: raise Exception("The 'ext' method can't select members.")
+            self.untargz_to_external(path, mode)
+        else:
+            self.untargz_to_internal(path, mode, select)
         # Return #
         return autopaths.dir_path.DirectoryPath(path + '/')
 
-    def untargz_to_internal(self, path, mode):
-        import tarfile
-        with tarfile.open(self.path, mode) as archive:
-            archive.extractall(path)
+    def untargz_to_internal(self, path, mode=None, select=None):
+        return extract_tar(self.path, path, select)
 
-    def untargz_to_external(self, path):
+    def untargz_to_external(self, path, mode='r:gz'):
         # Create the directory #
-        if path.endswith('/'): path.create_if_not_exists()
+        os.makedirs(str(path), exist_ok=True)
         # Make the command #
-        cmd = 'tar xzf %s -C %s' % (self.path, path)
-        result = subprocess.check_output(cmd, shell=True)
+        flags  = 'xzf' if mode.endswith('gz') else 'xf'
+        cmd    = ['tar', flags, str(self.path), '-C', str(path)]
+        result = subprocess.check_output(cmd)
         return result
 
     @property
@@ -482,117 +695,116 @@ class FilePath(autopaths.base_path.BasePath):
     @property
     def tar_top_dirs(self):
         """List all the top-level directories in the tar file."""
-        import subprocess
-        command = 'tar --exclude="*/*" -tf %s' % self.path
-        result = subprocess.check_output(command, shell=True)
-        return result.decode().splitlines()
+        return top_level_names(self.path)
+
+    #--------------------------- Archive members -----------------------------#
+    @property
+    def archive_contents(self):
+        """
+        The table of contents of a zip or tar archive, as a list of named
+        tuples with the fields `name`, `size`, `offset` and `is_dir`.
+        It is computed once and cached until the archive changes.
+        """
+        return table_of_contents(self.path)
+
+    def iter_archive_members(self, select=None):
+        """
+        Yield `(info, handle)` for every member of a zip or tar archive
+        without extracting anything to disk. The handle is a binary file
+        object that is only valid until the next member is requested, and
+        is None for directories. Pass `select` (a list of glob patterns or
+        a function) to skip the other members.
+        """
+        return iter_members(self.path, select)
+
+    def open_member(self, name, mode='rb', encoding=None):
+        """
+        Open a single member of a zip or tar archive for reading, as a
+        streaming file object. The member is located with the cached
+        table of contents when there is one, otherwise the archive is only
+        read up to the member. Build a gzip index first (see
+        `self.gzip_index`) to seek directly inside large tar.gz files.
+        """
+        return open_member(self.path, name, mode, encoding)
 
     #-------------------------------- Modify ---------------------------------#
     def append(self, data):
-        """Append some text or another file to the current file."""
-        if isinstance(data, FilePath): data = data.contents
-        with open(self.path, "a") as handle: handle.write(data)
-
-    def prepend(self, data, buffer_size=1 << 15):
         """
-        Prepend some text or an other file to the current file.
-        TODO:
-        * Add a random string to the backup file.
-        * Restore permissions after copy.
+        Append some text or another file to the current file.
+        Other files are copied by the kernel without going through python.
         """
+        if isinstance(data, FilePath):
+            self.concat_from([data], append=True)
+        else:
+            with open(self.path, "a") as handle: handle.write(data)
+
+    def prepend(self, data):
+        """Prepend some text or an other file to the current file."""
         # Check there is something to prepend #
         assert data
-        # Support passing other files #
-        if isinstance(data, FilePath): data = data.contents
-        # Create a new file #
-        result_file = autopaths.tmp_path.new_temp_file()
-        # Open input/output files, note: output file's permissions lost #
-        with open(self) as in_handle:
-            with open(result_file, 'w') as out_handle:
-                while data:
-                    out_handle.write(data)
-                    data = in_handle.read(buffer_size)
-        # Switch the files around #
-        self.remove()
-        result_file.move_to(self)
+        # Rewrite the file, keeping permissions #
+        prepend_file(self.path, data)
+
+    def concat_from(self, paths, append=False):
+        """
+        Concatenate several other files into this one, for instance:
+
+            >>> merged = FilePath('all_lanes.fastq')
+            >>> merged.concat_from(run_dir.glob('lane_*.fastq'))
+
+        The data is moved by the kernel (`copy_file_range` or `sendfile`)
+        when possible. With `append` the files are added at the end
+        of the current contents instead of replacing them.
+        """
+        self.make_directory()
+        concat_files(paths, self.path, append=append)
+        return self
+
+    def edit(self, encoding='utf-8'):
+        """
+        Start a transaction that queues several edits and applies them in a
+        single pass, atomically replacing the file while keeping its
+        permissions. For instance:
+
+            >>> with path.edit() as edit:
+            ...     edit.replace_word('before', 'after')
+            ...     edit.remove_first_line()
+            ...     edit.append('# The end\n')
+
+        See `autopaths.file_edit.FileEdit` for all the edits available.
+        """
+        return FileEdit(self.path, encoding)
 
     def remove_line(self, line_to_remove):
         """Search the file for a given line, and if found, remove it."""
-        # Check there is something to remove #
-        assert line_to_remove
-        # Create a new file #
-        result_file = autopaths.tmp_path.new_temp_file()
-        # Open input/output files, note: output file's permissions lost #
-        result_file.writelines(line for line in self if line != line_to_remove)
-        # Switch the files around #
-        self.remove()
-        result_file.move_to(self)
+        self.edit().remove_line(line_to_remove).commit()
 
     def remove_first_line(self):
         """
         Remove the first line of the file.
         Equivalent to sh.sed('-i', '1d', self.path)
         """
-        # Create a new file #
-        result_file = autopaths.tmp_path.new_temp_file()
-        # Open input/output files, note: output file's permissions lost #
-        all_lines = iter(self)
-        next(all_lines)
-        result_file.writelines(all_lines)
-        # Switch the files around #
-        self.remove()
-        result_file.move_to(self)
+        self.edit().remove_first_line().commit()
 
     def replace_line(self, line_to_remove, line_to_insert, safe=False):
         """
         Search the file for a given line, and if found,
         replace it with another line.
         """
-        # Check the line endings #
-        line_to_remove = line_to_remove.strip('\n')
-        line_to_insert = line_to_insert.strip('\n')
-        # Create a new file #
-        result_file = autopaths.tmp_path.new_temp_file()
-        # Generate the lines #
-        def new_lines():
-            found = False
-            for line in self:
-                if line.rstrip() == line_to_remove.rstrip():
-                    yield line_to_insert.rstrip() + '\n'
-                    found = True
-                else: yield line
-            if found is False and safe is False:
-                msg = "The line to replace ('%s') was not found in '%s'"
-                raise Exception(msg % (line_to_remove, self.path))
-        # Open input/output files, note: output file's permissions lost #
-        result_file.writelines(new_lines())
-        # Switch the files around #
-        self.remove()
-        result_file.move_to(self)
+        edit = self.edit()
+        edit.replace_line(line_to_remove, line_to_insert, safe)
+        edit.commit()
 
     def replace_word(self, word_to_find, replacement_word):
         """
         Search the file for a given word, and if found,
         replace every occurrence of it with another word.
         """
-        # Create a new file #
-        result_file = autopaths.tmp_path.new_temp_file()
-        # Generate the lines #
-        def new_lines():
-            for line in self:
-                yield line.replace(word_to_find, replacement_word)
-        # Open input/output files, note: output file's permissions lost #
-        result_file.writelines(new_lines())
-        # Switch the files around #
-        self.remove()
-        result_file.move_to(self)
-
-    #---------------------------- External tools -----------------------------#
+        self.edit().replace_word(word_to_find, replacement_word).commit()
+
     def sed_replace(self, before, after):
-        if os.name == "posix":
-            import sh
-            return sh.sed('-i', 's/%s/%s/' % (before, after), self.path)
-        if os.name == "nt":
-            import pbs3
-            sed_cmd = 'sed -i "s/%s/%s/" %s' % (before, after, self.path)
-            return pbs3.bash('-c', "'" + sed_cmd + "'" )
\ No newline at end of file
+        """
+        Replace the first match of a regular expression on every line,
+        like `sed -i 's/before/after/'` but without starting any process.
+        """
+        self.edit().sed_replace(before, after).commit()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal modules #
+from autopaths.fast_copy import copy_range
+
+# Constants #
+buffer_size = 1 << 16
+
+###############################################################################
+def fastq_record_start(data, position):
+    """
+    Check that a line starting at `position` in `data` is the header of a
+    FASTQ record. A quality line can also start with '@', but the line two
+    lines below a header always starts with '+'. Returns None when there
+    isn't enough data to decide.
+    """
+    if data[position:position + 1] != b'@': return False
+    second = data.find(b'\n', position)
+    third  = data.find(b'\n', second + 1) if second != -1 else -1
+    if third == -1 or third + 1 >= len(data): return None
+    return data[third + 1:third + 2] == b'+'
+
+###############################################################################
+def find_boundary(handle, offset, size, record_start=None):
+    """
+    Return the first position at or after `offset` where a new line (or a
+    new record) starts. Only the bytes near `offset` are read.
+    The `record_start` is either some bytes that every record starts with
+    (e.g. b'>' for FASTA) or a function like `fastq_record_start`.
+    """
+    # The start of the file is always a boundary #
+    if offset <= 0: return 0
+    # A line starts right after a newline, so look at the byte before #
+    position, window = offset - 1, buffer_size
+    while position < size:
+        handle.seek(position)
+        data = handle.read(window)
+        if not data: break
+        at_end = position + len(data) >= size
+        newline = data.find(b'\n')
+        while newline != -1:
+            candidate = newline + 1
+            if position + candidate >= size: return size
+            # Check the record start #
+            if record_start is None: return position + candidate
+            if callable(record_start): ok = record_start(data, candidate)
+            elif len(data) - candidate < len(record_start): ok = None
+            else: ok = data.startswith(record_start, candidate)
+            # We need to read more to decide #
+            if ok is None and not at_end: break
+            if ok: return position + candidate
+            newline = data.find(b'\n', candidate)
+        # Continue with a bigger window from the undecided newline #
+        if newline != -1: position, window = position + newline, window * 2
+        else:             position += len(data)
+    return size
+
+def shard_ranges(path, num_shards, record_start=None):
+    """
+    Partition a file into at most `num_shards` byte ranges of about equal
+    size, each starting at the start of a line (or a record). Only a few
+    bytes around each cut point are read. Returns `(start, end)` tuples
+    that together cover the whole file.
+    """
+    size = os.path.getsize(path)
+    if size == 0: return []
+    cuts = [size * i // num_shards for i in range(1, num_shards)]
+    with open(path, 'rb') as handle:
+        bounds = [find_boundary(handle, c, size, record_start) for c in cuts]
+    bounds = sorted(set([0] + bounds + [size]))
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+###############################################################################
+def split_file(path, directory, num_shards, record_start=None, workers=None):
+    """
+    Physically split a file in shards aligned on lines (or records) and
+    write them in parallel in a given directory. The data is copied by the
+    kernel when possible. Returns the list of new paths, in order.
+    """
+    # Don't use the methods of path objects #
+    path, directory = str(path), str(directory)
+    # Compute the ranges #
+    ranges = shard_ranges(path, num_shards, record_start)
+    # The names of the shards keep the original extension #
+    name = os.path.basename(path)
+    base, dot, extension = name.partition('.')
+    template = base + '.part%03i' + dot + extension
+    paths = [os.path.join(directory, template % i) for i in range(len(ranges))]
+    # Write one shard #
+    def write(job):
+        (start, end), destination = job
+        src_fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            flags  = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+            dst_fd = os.open(destination, flags | getattr(os, 'O_BINARY', 0),
+                             0o666)
+            try: copy_range(src_fd, dst_fd, start, end - start, 0)
+            finally: os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        return destination
+    # Write them all #
+    os.makedirs(directory, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers or len(ranges) or 1) as pool:
+        return list(pool.map(write, zip(ranges, paths)))
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, zlib, json, bisect, collections
+
+# Constants #
+buffer_size = 1 << 20
+gzip_magic  = b'\x1f\x8b'
+
+###############################################################################
+def iter_gunzip(handle, buffer_size=buffer_size):
+    """
+    Yield decompressed chunks of data from a binary handle that is
+    positioned at the start of a gzip member. Following members are
+    decompressed too, and trailing zero padding is ignored.
+    """
+    for chunk, _ in iter_members(handle, buffer_size):
+        if chunk: yield chunk
+
+def iter_members(handle, buffer_size=buffer_size):
+    """
+    Same as `iter_gunzip` but yields tuples of `(chunk, start)` where
+    `start` is None, except when a new gzip member starts right after
+    the current chunk, in which case it is its offset in the handle.
+    """
+    decompressor = zlib.decompressobj(31)
+    data = b''
+    while True:
+        # Get more input #
+        if not data:
+            data = handle.read(buffer_size)
+            if not data: break
+        # Decompress without producing unlimited output #
+        chunk = decompressor.decompress(data, buffer_size)
+        data  = decompressor.unconsumed_tail
+        # The current member is finished, maybe there is another one #
+        if decompressor.eof:
+            data = decompressor.unused_data
+            if len(data) < 2: data += handle.read(buffer_size)
+            if not data.startswith(gzip_magic):
+                yield chunk, None
+                break
+            yield chunk, handle.tell() - len(data)
+            decompressor = zlib.decompressobj(31)
+        else:
+            yield chunk, None
+
+def last_lines(chunks, num_lines):
+    """
+    Keep only the last `num_lines` lines of a stream of chunks, one more
+    in case the first one is incomplete, without holding the whole stream
+    in memory. Returns the lines without their newline characters and the
+    total number of lines seen.
+    """
+    lines, pending, count = collections.deque(maxlen=num_lines + 1), b'', 0
+    for chunk in chunks:
+        parts   = (pending + chunk).split(b'\n')
+        pending = parts.pop()
+        lines.extend(parts)
+        count  += len(parts)
+    # The last line might not end with a newline #
+    if pending:
+        lines.append(pending)
+        count += 1
+    return lines, count
+
+###############################################################################
+class GzipIndex(object):
+    """
+    A random access index for gzip files, in the style of `zran`.
+
+    The index records access points in the compressed stream from which
+    decompression can be restarted, along with the uncompressed offset and
+    the number of lines before each point. With it, reading at an arbitrary
+    offset, fetching lines N to M, or taking the tail of the file only
+    decompresses the nearby window instead of the whole stream.
+
+    Access points are placed at gzip member boundaries, because python's
+    `zlib` binding cannot resume inflation in the middle of a deflate
+    stream. Multi-member files such as the ones written by
+    `FilePath.gzip_to(method='prll')` or by `bgzip` therefore get one point
+    every `span` bytes of uncompressed data, while a classic single member
+    file only has the one point at its start.
+
+    The index is built once and stored in a sidecar file next to the
+    gzip file (`reads.fastq.gz.gzidx`) so it can be reused later.
+    """
+
+    extension = '.gzidx'
+
+    def __repr__(self):
+        msg = '<%s object on "%s" with %i points>'
+        return msg % (self.__class__.__name__, self.path, len(self.points))
+
+    def __init__(self, path, points, total_size, total_lines, stamp=None):
+        # Attributes #
+        self.path        = path
+        self.points      = points
+        self.total_size  = total_size
+        self.total_lines = total_lines
+        self.stamp       = stamp or self.stamp_of(path)
+        # For binary search #
+        self.offsets = [p[1] for p in points]
+        self.counts  = [p[2] for p in points]
+
+    def __len__(self): return self.total_size
+
+    @staticmethod
+    def stamp_of(path):
+        """The size and modification time, to check the index is current."""
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    #------------------------------- Building --------------------------------#
+    @classmethod
+    def build(cls, path, span=1 << 20, buffer_size=buffer_size):
+        """
+        Decompress the whole file once, recording an access point at
+        every member boundary that is at least `span` bytes of uncompressed
+        data away from the previous one.
+        """
+        # Each point is (compressed, uncompressed, lines before) #
+        points = [(0, 0, 0)]
+        uncompressed, lines = 0, 0
+        with open(path, 'rb') as handle:
+            for chunk, start in iter_members(handle, buffer_size):
+                uncompressed += len(chunk)
+                lines        += chunk.count(b'\n')
+                if start is None: continue
+                if uncompressed - points[-1][1] >= span:
+                    points.append((start, uncompressed, lines))
+        # Return #
+        return cls(path, points, uncompressed, lines)
+
+    #------------------------------- Sidecar ---------------------------------#
+    @classmethod
+    def sidecar_of(cls, path): return path + cls.extension
+
+    def save(self, sidecar=None):
+        """Write the index to a sidecar file."""
+        if sidecar is None: sidecar = self.sidecar_of(self.path)
+        info = {'stamp':       self.stamp,
+                'total_size':  self.total_size,
+                'total_lines': self.total_lines,
+                'points':      self.points}
+        with open(sidecar, 'w') as handle: json.dump(info, handle)
+        return sidecar
+
+    @classmethod
+    def load(cls, path, sidecar=None):
+        """
+        Read an index from its sidecar file. Returns None if the sidecar
+        does not exist or if the gzip file changed since it was written.
+        """
+        if sidecar is None: sidecar = cls.sidecar_of(path)
+        if not os.path.exists(sidecar): return None
+        with open(sidecar) as handle: info = json.load(handle)
+        if info['stamp'] != cls.stamp_of(path): return None
+        points = [tuple(p) for p in info['points']]
+        return cls(path, points, info['total_size'], info['total_lines'],
+                   info['stamp'])
+
+    @classmethod
+    def get(cls, path, save=True, **kwargs):
+        """Load the index if it is current, otherwise build it."""
+        index = cls.load(path)
+        if index is not None: return index
+        index = cls.build(path, **kwargs)
+        if save:
+            try: index.save()
+            except OSError: pass
+        return index
+
+    #------------------------------- Reading ---------------------------------#
+    def iter_from_point(self, i):
+        """Yield decompressed chunks starting at access point number `i`."""
+        with open(self.path, 'rb') as handle:
+            handle.seek(self.points[i][0])
+            for chunk in iter_gunzip(handle): yield chunk
+
+    def iter_from(self, offset):
+        """Yield decompressed chunks starting at an uncompressed offset."""
+        i = max(bisect.bisect_right(self.offsets, offset) - 1, 0)
+        skip = offset - self.offsets[i]
+        for chunk in self.iter_from_point(i):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+
+    def read(self, offset, size):
+        """Read `size` bytes of uncompressed data at a given offset."""
+        result = bytearray()
+        for chunk in self.iter_from(offset):
+            result += chunk
+            if len(result) >= size: break
+        return bytes(result[:size])
+
+    def segment(self, i):
+        """All the uncompressed data between point `i` and the next one."""
+        if i + 1 < len(self.points): end = self.offsets[i + 1]
+        else:                        end = self.total_size
+        return self.read(self.offsets[i], end - self.offsets[i])
+
+    def lines(self, start, stop=None, encoding='utf-8'):
+        """
+        Yield the lines numbered `start` to `stop` (zero based and not
+        including `stop`) without their newline characters.
+        """
+        # Pick the last point before the line starts #
+        i = max(bisect.bisect_left(self.counts, start) - 1, 0)
+        skip, current, pending = start - self.counts[i], start, b''
+        for chunk in self.iter_from_point(i):
+            data = pending + chunk
+            # Skip the lines we don't want yet #
+            while skip:
+                position = data.find(b'\n')
+                if position < 0: break
+                data, skip = data[position + 1:], skip - 1
+            if skip:
+                pending = b''
+                continue
+            # Yield complete lines #
+            parts, pending = data.split(b'\n'), b''
+            pending = parts.pop()
+            for line in parts:
+                if stop is not None and current >= stop: return
+                yield line.decode(encoding)
+                current += 1
+        # The last line might not end with a newline #
+        if pending and (stop is None or current < stop):
+            yield pending.decode(encoding)
+
+    def tail(self, num_lines=20, encoding='utf-8'):
+        """
+        Return the last few lines, only decompressing from the last access
+        point, or an earlier one if there aren't enough lines after it.
+        The data is streamed so memory stays bounded.
+        """
+        for i in reversed(range(len(self.points))):
+            lines, count = last_lines(self.iter_from_point(i), num_lines)
+            # After a point other than the first, the first line is partial #
+            if i == 0 or count > num_lines: break
+        return [l.decode(encoding) for l in list(lines)[-num_lines:]]
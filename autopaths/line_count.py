@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, mmap
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Internal modules #
+from autopaths.compressed_io import detect_compression, iter_decompressed
+
+# Constants #
+buffer_size        = 1 << 20
+parallel_threshold = 1 << 30
+min_range_size     = 1 << 26
+gzip_magic         = b'\x1f\x8b'
+
+###############################################################################
+def count_lines(path, workers=None, pool='process', use_mmap=False,
+                decompress=True, buffer_size=buffer_size):
+    """
+    Count the number of newline characters in a file, just like `wc -l`
+    would, but without starting any external process.
+
+    * Small files are read sequentially with a large reusable buffer.
+    * Files above `parallel_threshold` bytes are split into byte ranges
+      that are counted concurrently on a `pool` which can be either
+      'process' or 'thread'. You can force the number of `workers`.
+    * Compressed files (gzip, bz2, xz or zstd detected with their magic
+      number) are decompressed while streaming and the lines of the
+      decompressed data are counted.
+    """
+    # Check the magic number #
+    fmt = detect_compression(path) if decompress else None
+    if fmt is not None: return count_lines_compressed(path, fmt, buffer_size)
+    # Get the size #
+    size = os.path.getsize(path)
+    if size == 0: return 0
+    # Pick the number of workers #
+    if workers is None:
+        if size < parallel_threshold: workers = 1
+        else: workers = min(os.cpu_count() or 1, size // min_range_size)
+    # The sequential case #
+    if workers <= 1: return count_range(path, 0, size, use_mmap, buffer_size)
+    # Split the file in equal byte ranges #
+    step   = -(-size // workers)
+    starts = list(range(0, size, step))
+    ends   = [min(start + step, size) for start in starts]
+    # Pick the pool #
+    if pool == 'process': executor = ProcessPoolExecutor
+    elif pool == 'thread': executor = ThreadPoolExecutor
+    else: raise Exception("Unrecognized pool type '%s'." % pool)
+    # Count all the ranges #
+    with executor(max_workers=workers) as ex:
+        counts = ex.map(count_range,
+                        [path] * len(starts), starts, ends,
+                        [use_mmap] * len(starts), [buffer_size] * len(starts))
+        return sum(counts)
+
+###############################################################################
+def count_range(path, start, end, use_mmap=False, buffer_size=buffer_size):
+    """Count the newline characters between two byte offsets of a file."""
+    # Memory map case #
+    if use_mmap:
+        with open(path, 'rb') as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                total = 0
+                for i in range(start, end, buffer_size):
+                    total += m[i:min(i + buffer_size, end)].count(b'\n')
+                return total
+    # Fixed size buffer case #
+    total  = 0
+    buffer = bytearray(buffer_size)
+    view   = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as handle:
+        handle.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            read = handle.readinto(view[:min(buffer_size, remaining)])
+            if not read: break
+            if read == buffer_size: total += buffer.count(b'\n')
+            else:                   total += view[:read].tobytes().count(b'\n')
+            remaining -= read
+    return total
+
+###############################################################################
+def count_lines_compressed(path, fmt=None, buffer_size=buffer_size):
+    """Count the newline characters of a compressed file while streaming."""
+    return sum(chunk.count(b'\n')
+               for chunk in iter_decompressed(path, fmt, buffer_size))
+
+###############################################################################
+def is_gzipped(path):
+    """Check the first two bytes of a file for the gzip magic number."""
+    with open(path, 'rb') as handle: return handle.read(2) == gzip_magic
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, re, sys, mmap, array, struct
+
+# Constants #
+header  = struct.Struct('<8sQQ')
+magic   = b'APLIDX01'
+window  = 1 << 24
+newline = re.compile(b'\n')
+
+###############################################################################
+class LineIndex(object):
+    """
+    An array with the byte offset at which every line of a file starts,
+    eight bytes per line. It can be stored in a sidecar file next to the
+    original (`reads.fastq.lidx`) so that it is only built once. The
+    sidecar is ignored when the file has changed. When saving, the
+    offsets are streamed to the sidecar as they are found and then
+    memory mapped from it, so they never all have to fit in memory.
+    """
+
+    extension = '.lidx'
+
+    def __repr__(self):
+        msg = '<%s object on "%s" with %i lines>'
+        return msg % (self.__class__.__name__, self.path, len(self))
+
+    def __init__(self, path, offsets, stamp=None):
+        self.path    = path
+        self.offsets = offsets
+        self.stamp   = stamp or self.stamp_of(path)
+
+    def __len__(self): return len(self.offsets)
+
+    @staticmethod
+    def stamp_of(path):
+        """The size and modification time, to check the index is current."""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    #------------------------------- Building --------------------------------#
+    @staticmethod
+    def scan(path, window=window):
+        """
+        Map the file in memory and yield arrays with the offsets of the
+        lines starting in each successive `window` of bytes. The newlines
+        of a window are found by the regular expression engine in one go,
+        so there is no python loop per line.
+        """
+        size = os.path.getsize(path)
+        if size == 0: return
+        yield array.array('Q', [0])
+        with open(path, 'rb') as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for start in range(0, size, window):
+                    matches = newline.finditer(m, start, start + window)
+                    chunk   = array.array('Q', map(re.Match.end, matches))
+                    # A final newline doesn't start a new line #
+                    if chunk and chunk[-1] == size: chunk.pop()
+                    yield chunk
+
+    @classmethod
+    def build(cls, path, sidecar=None):
+        """
+        Scan the file once and record every line. Without a `sidecar` the
+        offsets are kept in memory, otherwise they are written to it as
+        they are found and the index is loaded back from it.
+        """
+        stamp = cls.stamp_of(path)
+        if sidecar is None:
+            offsets = array.array('Q')
+            for chunk in cls.scan(path): offsets.extend(chunk)
+            return cls(path, offsets, stamp)
+        # Stream to a temporary file, then put it in place #
+        temp = sidecar + '.tmp'
+        with open(temp, 'wb') as handle:
+            handle.write(header.pack(magic, *stamp))
+            for chunk in cls.scan(path):
+                if sys.byteorder != 'little': chunk.byteswap()
+                chunk.tofile(handle)
+        os.replace(temp, sidecar)
+        return cls.load(path, sidecar)
+
+    #------------------------------- Sidecar ---------------------------------#
+    @classmethod
+    def sidecar_of(cls, path): return path + cls.extension
+
+    def save(self, sidecar=None):
+        """Write the offsets to a sidecar file."""
+        if sidecar is None: sidecar = self.sidecar_of(self.path)
+        offsets = self.offsets
+        if sys.byteorder != 'little':
+            offsets = array.array('Q', offsets)
+            offsets.byteswap()
+        with open(sidecar, 'wb') as handle:
+            handle.write(header.pack(magic, *self.stamp))
+            handle.write(offsets)
+        return sidecar
+
+    @classmethod
+    def load(cls, path, sidecar=None):
+        """
+        Read the offsets from a sidecar file. Returns None if the sidecar
+        does not exist or if the file changed since it was written. The
+        offsets are memory mapped rather than read, except on big endian
+        machines where they have to be converted.
+        """
+        if sidecar is None: sidecar = cls.sidecar_of(path)
+        if not os.path.exists(sidecar): return None
+        with open(sidecar, 'rb') as handle:
+            tag, size, mtime = header.unpack(handle.read(header.size))
+            if tag != magic or (size, mtime) != cls.stamp_of(path):
+                return None
+            if sys.byteorder == 'little':
+                m = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                offsets = memoryview(m)[header.size:].cast('Q')
+            else:
+                offsets = array.array('Q')
+                offsets.frombytes(handle.read())
+                offsets.byteswap()
+        return cls(path, offsets, (size, mtime))
+
+    @classmethod
+    def get(cls, path, save=False):
+        """Load the index if it is current, otherwise build it."""
+        index = cls.load(path)
+        if index is not None: return index
+        if save: return cls.build(path, cls.sidecar_of(path))
+        return cls.build(path)
+
+###############################################################################
+class LineView(object):
+    """
+    A lazy, read-only view of the lines of a file that supports `len()`,
+    indexing, slicing and `reversed()` without ever loading the whole file
+    in memory. The file is memory mapped and the lines are located with a
+    `LineIndex`. Like `FilePath.lines`, lines are given without their
+    trailing newline.
+
+        >>> view = path.line_view()
+        >>> len(view)
+        >>> view[-1]
+        >>> view[4000000:4000004]
+    """
+
+    def __repr__(self):
+        msg = '<%s object on "%s" with %i lines>'
+        return msg % (self.__class__.__name__, self.path, len(self))
+
+    def __init__(self, path, index=None, encoding='utf-8', save=False):
+        # Attributes #
+        self.path     = path
+        self.encoding = encoding
+        self.index    = index or LineIndex.get(path, save)
+        self.offsets  = self.index.offsets
+        self.size     = self.index.stamp[0]
+        # Memory map #
+        self.handle = open(path, 'rb')
+        if self.size: self.map = mmap.mmap(self.handle.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+        else:         self.map = b''
+
+    def __enter__(self): return self
+
+    def __exit__(self, err_type, value, traceback): self.close()
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap): self.map.close()
+        self.handle.close()
+
+    def __len__(self): return len(self.offsets)
+
+    def __iter__(self):
+        for i in range(len(self)): yield self.line(i)
+
+    def __reversed__(self):
+        for i in reversed(range(len(self))): yield self.line(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.line(i) for i in range(*key.indices(len(self)))]
+        if key < 0: key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Line %s out of range in '%s'" % (key, self.path))
+        return self.line(key)
+
+    def raw(self, i):
+        """The bytes of line `i`, including its newline if it has one."""
+        start = self.offsets[i]
+        if i + 1 < len(self.offsets): end = self.offsets[i + 1]
+        else:                         end = self.size
+        return self.map[start:end]
+
+    def line(self, i):
+        """The decoded line `i`, without its newline."""
+        return self.raw(i).rstrip(b'\r\n').decode(self.encoding)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, zlib, collections
+from concurrent.futures import ThreadPoolExecutor
+
+# Constants #
+block_size = 1 << 22
+
+###############################################################################
+def compress_block(data, level):
+    """
+    Compress a block of data into a complete and independent gzip member.
+    The `zlib` module releases the GIL while it is compressing.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+###############################################################################
+class ParallelGzipWriter(object):
+    """
+    A writable binary file object that compresses the data it receives in
+    independent blocks on a pool of threads. Each block becomes a separate
+    gzip member, in order, which gives a standards compliant multi-member
+    gzip file that any `gunzip` or `gzip.open` can read back.
+
+        >>> with ParallelGzipWriter('out.gz', level=6) as handle:
+        ...     handle.write(b'some data')
+
+    You can pass either a path or an already opened binary handle.
+    Blocks can also be given their own compression level with
+    `write(data, level=0)`, in which case the data is never mixed with
+    data that has a different level.
+    """
+
+    def __init__(self, path, level=6, block_size=block_size, workers=None):
+        # Attributes #
+        self.level      = level
+        self.block_size = block_size
+        self.workers    = workers or os.cpu_count() or 1
+        # Output handle #
+        if isinstance(path, (str, bytes, os.PathLike)):
+            self.handle, self.own_handle = open(path, 'wb'), True
+        else:
+            self.handle, self.own_handle = path, False
+        # State #
+        self.buffer  = bytearray()
+        self.current = level
+        self.pending = collections.deque()
+        self.members = 0
+        self.position = 0
+        self.pool    = ThreadPoolExecutor(max_workers=self.workers)
+        self.closed  = False
+
+    def __enter__(self): return self
+
+    def __exit__(self, err_type, value, traceback): self.close()
+
+    def writable(self): return True
+
+    def tell(self):
+        """The number of uncompressed bytes written so far."""
+        return self.position
+
+    def write(self, data, level=None):
+        """Add some data to the stream, compressed at a given level."""
+        # Default level #
+        if level is None: level = self.level
+        # Never mix data that should be compressed differently #
+        if level != self.current:
+            self.end_block()
+            self.current = level
+        # Fill the buffer and dispatch full blocks #
+        self.buffer   += data
+        self.position += len(data)
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def end_block(self):
+        """Force the currently buffered data to be compressed on its own."""
+        if self.buffer: self.submit(bytes(self.buffer))
+        self.buffer = bytearray()
+
+    def submit(self, data):
+        # Queue a new block #
+        self.members += 1
+        self.pending.append(self.pool.submit(compress_block, data,
+                                             self.current))
+        # Write out finished blocks but limit the memory used #
+        while self.pending and (self.pending[0].done() or
+                                len(self.pending) > 2 * self.workers):
+            self.handle.write(self.pending.popleft().result())
+
+    def flush(self):
+        """Compress what is buffered and write all blocks to the handle."""
+        self.end_block()
+        while self.pending: self.handle.write(self.pending.popleft().result())
+        self.handle.flush()
+
+    def close(self):
+        if self.closed: return
+        try:
+            # An empty input still needs to give a valid gzip file #
+            if not self.members and not self.buffer: self.submit(b"")
+            self.flush()
+        finally:
+            self.pool.shutdown()
+            if self.own_handle: self.handle.close()
+            self.closed = True
+
+###############################################################################
+def parallel_gzip(source, destination, level=6, block_size=block_size,
+                  workers=None, buffer_size=1 << 22):
+    """Compress a file into a multi-member gzip file using many threads."""
+    with open(source, 'rb') as in_handle:
+        with ParallelGzipWriter(destination, level, block_size, workers) as w:
+            for chunk in iter(lambda: in_handle.read(buffer_size), b""):
+                w.write(chunk)
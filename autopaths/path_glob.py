@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, re, fnmatch, functools, itertools
+
+# Internal modules #
+from autopaths.archive_builder import is_excluded
+from autopaths.dir_walk import scan, walk
+
+# Constants #
+if os.name == "posix": sep = "/"
+if os.name == "nt":    sep = "\\"
+magic = re.compile('[*?[]')
+
+###############################################################################
+class Matcher(object):
+    """
+    A pattern compiled once and then matched against the entries below a
+    directory. The pattern is either:
+
+    * A glob string like `'*.fastq.gz'` or `'lane_*/**/*.fastq'`, where
+      `**` stands for any number of directories. Every segment is compiled
+      separately so that only the directories that can still match are
+      listed, and segments without wildcards are looked up directly.
+    * A compiled regular expression, searched in the relative path of
+      every entry.
+    * A set, list or tuple of name endings like `{'.fq', '.fastq.gz'}`.
+
+    As with `glob.glob`, names starting with a dot are only matched by
+    segments that start with a dot themselves.
+    """
+
+    def __repr__(self):
+        return '<%s object for %r>' % (self.__class__.__name__, self.pattern)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        # A regular expression #
+        if isinstance(pattern, re.Pattern):
+            self.kind  = 'regex'
+            self.match = lambda rel, name: pattern.search(rel) is not None
+        # A set of extensions #
+        elif isinstance(pattern, (set, frozenset, list, tuple)):
+            self.kind  = 'ends'
+            endings    = tuple(pattern)
+            self.match = lambda rel, name: name.endswith(endings)
+        # A glob #
+        elif isinstance(pattern, str):
+            self.kind     = 'glob'
+            pattern       = pattern.replace('\\' if sep == '/' else '/', sep)
+            self.dir_only = pattern.endswith(sep)
+            parts         = [p for p in pattern.split(sep) if p]
+            if not parts:
+                raise Exception("The glob pattern '%s' is empty." % pattern)
+            self.segments = [self.compile_segment(p) for p in parts]
+            self.repeats  = parts.count('**') > 1
+        else:
+            raise Exception("Unrecognized pattern type '%s'." % type(pattern))
+
+    @staticmethod
+    def compile_segment(part):
+        """Returns a tuple of `(kind, part, function)` for one segment."""
+        if part == '**': return ('recursive', part, None)
+        if not magic.search(part): return ('literal', part, None)
+        regex = re.compile(fnmatch.translate(os.path.normcase(part)))
+        if part.startswith('.'):
+            return ('wildcard', part, lambda n: regex.match(n) is not None)
+        return ('wildcard', part,
+                lambda n: not n.startswith('.') and regex.match(n) is not None)
+
+    #------------------------------- Matching --------------------------------#
+    def iterate(self, root, exclude=None):
+        """
+        Yield the paths that match below `root` lazily, as strings. When
+        `root` is empty, the current directory is searched and the paths
+        yielded are relative. `exclude` is a list of glob patterns or a
+        function taking the relative path, and excluded directories are
+        never listed.
+        """
+        root = str(root)
+        if self.kind == 'glob': return self.iterate_glob(root, exclude)
+        return self.iterate_walk(root, exclude)
+
+    def iterate_walk(self, root, exclude):
+        """For regular expressions and extensions, every entry is visited."""
+        top    = root or os.curdir
+        prefix = len(top.rstrip(sep)) + 1 if top.rstrip(sep) else 1
+        def relative(item): return item.path[prefix:]
+        prune  = (lambda item: is_excluded(relative(item), exclude)) \
+                 if exclude else None
+        for item in walk(top, prune=prune):
+            rel = relative(item)
+            if exclude and is_excluded(rel, exclude): continue
+            if not self.match(rel, item.name): continue
+            yield os.path.join(root, rel) if root else rel
+
+    def iterate_glob(self, root, exclude):
+        """Only list the directories that can still lead to a match."""
+        # Every state is a directory and the index of the next segment #
+        segments, last = self.segments, len(self.segments) - 1
+        stack = [(root, '', 0)]
+        seen  = set() if self.repeats else None
+        while stack:
+            directory, rel, index = stack.pop()
+            if seen is not None:
+                if (rel, index) in seen: continue
+                seen.add((rel, index))
+            kind, part, function = segments[index]
+            join = lambda name: (rel + sep + name) if rel else name
+            full = lambda name: os.path.join(directory, name)
+            # A plain name, no need to list the directory #
+            if kind == 'literal':
+                child = full(part)
+                if exclude and is_excluded(join(part), exclude): continue
+                if index == last:
+                    if self.dir_only and not os.path.isdir(child): continue
+                    if os.path.lexists(child): yield child
+                elif os.path.isdir(child):
+                    stack.append((child, join(part), index + 1))
+                continue
+            # List the directory, in order #
+            entries = scan(directory or os.curdir)
+            entries.sort(key=lambda e: e.name)
+            inside  = []
+            for entry in entries:
+                name = entry.name
+                if exclude and is_excluded(join(name), exclude): continue
+                # Any number of directories, the symlinks are not followed #
+                if kind == 'recursive':
+                    if name.startswith('.'): continue
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if index == last:
+                        if not self.dir_only or is_dir: yield full(name)
+                    if is_dir: inside.append((full(name), join(name), index))
+                # A single name with wildcards #
+                elif function(os.path.normcase(name)):
+                    if index == last:
+                        if not self.dir_only or entry.is_dir(): yield full(name)
+                    elif entry.is_dir():
+                        inside.append((full(name), join(name), index + 1))
+            # Zero directories for `**` comes first, then the rest in order #
+            stack.extend(reversed(inside))
+            if kind == 'recursive' and index < last:
+                stack.append((directory, rel, index + 1))
+
+###############################################################################
+@functools.lru_cache(maxsize=256)
+def compile_glob(pattern):
+    """Compile a glob string, reusing the result for the same string."""
+    return Matcher(pattern)
+
+def compile_pattern(pattern):
+    """Turn any accepted pattern into a `Matcher`."""
+    if isinstance(pattern, Matcher): return pattern
+    if isinstance(pattern, str): return compile_glob(pattern)
+    return Matcher(pattern)
+
+def split_root(path):
+    """
+    Split an absolute or relative glob into the part without wildcards
+    and the rest, for instance `'/data/run_*/a.txt'` gives `'/data'` and
+    `'run_*/a.txt'`.
+    """
+    parts = path.split(sep)
+    for i, part in enumerate(parts):
+        if magic.search(part): break
+    else:
+        return path, ''
+    root = sep.join(parts[:i])
+    if not root and path.startswith(sep): root = sep
+    return root, sep.join(parts[i:])
+
+def iglob(root, pattern, exclude=None):
+    """Lazily yield the paths matching `pattern` below `root`."""
+    return compile_pattern(pattern).iterate(root, exclude)
+
+def iglob_path(path):
+    """Lazily yield the paths matching a full glob like `'/data/*/a.txt'`."""
+    root, pattern = split_root(path)
+    if not pattern: return iter([path] if os.path.lexists(path) else [])
+    return iglob(root, pattern)
+
+def first_matches(path, count=2):
+    """Return at most `count` paths matching a full glob."""
+    return list(itertools.islice(iglob_path(path), count))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair.
+MIT Licensed.
+Contact at www.sinclair.bio
+"""
+
+# Built-in modules #
+import os, time, random, codecs, collections
+
+# Internal modules #
+from autopaths.dir_index import racy_window
+
+# Constants #
+sample_size = 8192
+magic_numbers = [('gzip', 0,   b'\x1f\x8b'),
+                 ('bz2',  0,   b'BZh'),
+                 ('xz',   0,   b'\xfd7zXZ\x00'),
+                 ('zstd', 0,   b'\x28\xb5\x2f\xfd'),
+                 ('zip',  0,   b'PK\x03\x04'),
+                 ('zip',  0,   b'PK\x05\x06'),
+                 ('zip',  0,   b'PK\x07\x08'),
+                 ('tar',  257, b'ustar')]
+boms = [(codecs.BOM_UTF8,     'utf-8-sig'),
+        (codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16')]
+text_bytes = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+# The result #
+ContentInfo = collections.namedtuple('ContentInfo',
+                                     'binary encoding compression')
+
+# The cache #
+cache = {}
+max_cache_entries = 1 << 16
+
+###############################################################################
+def compression_of(data):
+    """Guess the compression or archive format from the first bytes."""
+    for name, offset, magic in magic_numbers:
+        if data[offset:offset + len(magic)] == magic: return name
+    return None
+
+def encoding_of(samples):
+    """
+    Guess the encoding of some samples of text, or return None if the
+    samples look like binary data.
+    """
+    # Byte order marks #
+    for bom, name in boms:
+        if samples[0].startswith(bom): return name
+    # Null bytes never appear in text #
+    if any(b'\0' in s for s in samples): return None
+    # Pure ascii #
+    if all(s.isascii() for s in samples): return 'ascii'
+    # Valid utf-8, samples might cut a character on their edges #
+    try:
+        for i, sample in enumerate(samples):
+            if i: sample = sample.lstrip(bytes(range(0x80, 0xc0)))
+            codecs.getincrementaldecoder('utf-8')().decode(sample)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    # Mostly control characters means binary #
+    total   = sum(len(s) for s in samples)
+    control = sum(len(s.translate(None, text_bytes)) for s in samples)
+    if total and control / total > 0.3: return None
+    return 'latin-1'
+
+###############################################################################
+def read_samples(path, sample_size=sample_size, num_samples=3):
+    """
+    Read a sample at the start of the file, and a few more at random
+    offsets. The offsets only depend on the file size so that the same
+    file is always sampled the same way.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as handle:
+        samples = [handle.read(sample_size)]
+        if size <= sample_size * (num_samples + 1): return samples
+        rand = random.Random(size)
+        offsets = sorted(rand.randrange(sample_size, size - sample_size)
+                         for _ in range(num_samples))
+        for offset in offsets:
+            handle.seek(offset)
+            samples.append(handle.read(sample_size))
+    return samples
+
+def sniff(path, sample_size=sample_size, num_samples=3, use_cache=True):
+    """
+    Classify the contents of a file by reading only a bounded sample
+    of it: a block at the start and `num_samples` blocks at random offsets.
+    Returns a `ContentInfo` with the fields:
+
+    * `binary`, True if the file doesn't look like text.
+    * `encoding`, a guess such as 'ascii', 'utf-8' or 'latin-1', None if
+      the file is binary.
+    * `compression`, one of 'gzip', 'bz2', 'xz', 'zstd', 'zip', 'tar'
+      or None.
+
+    Results are cached per (device, inode, size, mtime_ns), except for
+    files modified in the last couple of seconds.
+    """
+    # Check the cache #
+    stat = os.stat(path)
+    key  = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if use_cache and key in cache: return cache[key]
+    # Sample #
+    samples = read_samples(path, sample_size, num_samples)
+    # Compressed files are binary #
+    compression = compression_of(samples[0])
+    if compression is not None and compression != 'tar':
+        info = ContentInfo(True, None, compression)
+    else:
+        encoding = encoding_of(samples)
+        info = ContentInfo(encoding is None, encoding, compression)
+    # Store in the cache, unless the file could still change unnoticed #
+    if use_cache and time.time_ns() - stat.st_mtime_ns >= racy_window:
+        if len(cache) >= max_cache_entries: cache.clear()
+        cache[key] = info
+    return info
@@ -14,7 +14,7 @@ You can run this file like this:
 """
 
 # Built-in modules #
-import os, inspect
+import os, inspect, atexit
 
 # Get the current directory #
 file_name = os.path.abspath((inspect.stack()[0])[1])
@@ -25,6 +25,14 @@ dummy_files = this_dir + 'dummy_file_system/'
 
 # Internal modules #
 from autopaths.dir_path import DirectoryPath
+from autopaths.tmp_path import new_temp_dir
+from autopaths import dir_watch
+from autopaths import checksums
+
+# Never write to the checksum cache in the home directory #
+cache_dir = new_temp_dir()
+checksums.default_cache.path = cache_dir + 'checksums.sqlite'
+atexit.register(cache_dir.remove)
 
 ###############################################################################
 def test_list_files():
@@ -38,7 +46,303 @@ def test_symlink():
     print(source, destin)
     source.link_to(destin)
 
+def make_tree():
+    d = new_temp_dir()
+    src = d + 'src/'
+    for name in ('a.txt', 'sub/b.txt', 'sub/deep/c.txt', 'skip/d.txt'):
+        (src + name).make_directory()
+        (src + name).write('contents of %s\n' % name * 100)
+    (src + 'a.txt').compress_to(src + 'sub/e.txt.gz')
+    return d, src
+
+def test_archives():
+    import tarfile, zipfile
+    d, src = make_tree()
+    tar = src.targz_to(d + 'out.tar.gz', workers=2, exclude=['skip'])
+    with tarfile.open(tar) as handle: names = handle.getnames()
+    assert names == ['a.txt', 'sub', 'sub/b.txt', 'sub/deep',
+                     'sub/e.txt.gz', 'sub/deep/c.txt']
+    plain = src.tar_to(d + 'out.tar')
+    with tarfile.open(plain) as handle: assert len(handle.getnames()) == 8
+    zipped = src.zip_to(d + 'out.zip', exclude=lambda p: 'deep' in p)
+    with zipfile.ZipFile(zipped) as handle:
+        info = handle.getinfo('sub/e.txt.gz')
+        assert info.compress_type == zipfile.ZIP_STORED
+        assert 'sub/deep/c.txt' not in handle.namelist()
+    d.remove()
+
+def test_bulk_ops():
+    from autopaths.bulk_ops import bulk_copy, bulk_move, bulk_remove
+    d, src = make_tree()
+    os.symlink('a.txt', src + 'link.txt')
+    # Parallel copy of a tree #
+    src.copy(d + 'copy/', workers=4)
+    copy = DirectoryPath(d + 'copy/')
+    assert sorted(f - copy for f in copy.files) == \
+           sorted(f - src for f in src.files)
+    assert os.readlink(copy + 'link.txt') == 'a.txt'
+    # Bulk operations on many files #
+    files = list(copy.files)
+    pairs = [(f, d + 'moved/' + f.name + '.%i' % i)
+             for i, f in enumerate(files)]
+    results = bulk_move(pairs, workers=4)
+    assert all(r.ok for r in results)
+    assert not any(f.exists for f in files)
+    results = bulk_copy([(d + 'missing.txt', d + 'other.txt')])
+    assert not results[0].ok
+    results = bulk_remove([p[1] for p in pairs])
+    assert all(r.ok for r in results)
+    assert not list(DirectoryPath(d + 'moved/').files)
+    # Unnest #
+    sub = DirectoryPath(src + 'sub/')
+    sub.unnest()
+    assert (src + 'b.txt').exists and (src + 'deep/c.txt').exists
+    assert not sub.exists
+    d.remove()
+
+def test_walk():
+    d, src = make_tree()
+    os.symlink(src, src + 'sub/loop')
+    names = lambda entries: sorted(os.path.relpath(e.path, src)
+                                   for e in entries)
+    # Depth limits and pruning #
+    assert names(src.walk(max_depth=1)) == ['a.txt', 'skip', 'sub']
+    pruned = src.walk(prune=lambda e: e.name in ('skip', 'deep'))
+    assert names(pruned) == ['a.txt', 'skip', 'sub', 'sub/b.txt', 'sub/deep',
+                             'sub/e.txt.gz', 'sub/loop']
+    # Symbolic links are only followed on demand, without looping #
+    followed = names(src.walk(follow_symlinks=True))
+    assert 'sub/loop/a.txt' not in followed
+    assert len(followed) == 9
+    # Bottom up, directories come after their contents #
+    order = [e.name for e in src.walk(topdown=False)]
+    assert order.index('c.txt') < order.index('deep') < order.index('sub')
+    # Cached stat and the path properties #
+    entry = next(e for e in src.walk() if e.name == 'a.txt')
+    assert entry.stat().st_size == (src + 'a.txt').count_bytes
+    assert len(list(src.files)) == 5
+    assert len(list(src.directories)) == 4
+    assert [f.name for f in src.flat_files] == ['a.txt']
+    assert [f.name for f in src.flat_directories] == ['skip', 'sub']
+    d.remove()
+
+def test_parallel_walk():
+    d, src = make_tree()
+    for i in range(20): (src + 'many/%02i/%02i.txt' % (i, i)).make_directory()
+    serial  = [e.path for e in src.walk()]
+    ordered = [e.path for e in src.walk(workers=4, ordered=True)]
+    assert ordered == serial
+    unordered = [e.path for e in src.walk(workers=4)]
+    assert sorted(unordered) == sorted(serial)
+    pruned = list(src.walk(workers=3, prune=lambda e: e.name == 'many'))
+    assert len(pruned) == len(serial) - 20
+    d.remove()
+
+def test_disk_usage():
+    d, src = make_tree()
+    os.link(src + 'a.txt', src + 'sub/hard.txt')
+    files = [f for f in src.files if f.name != 'hard.txt']
+    assert src.size == sum(f.count_bytes for f in files)
+    usage = src.disk_usage(workers=4, breakdown=2)
+    assert usage.files == 5 and usage.directories == 4
+    assert usage.allocated >= usage.apparent
+    sub = usage.children['sub']
+    assert sorted(usage.children) == ['skip', 'sub']
+    assert sub.children['deep'].files == 1
+    assert sub.children['deep'].apparent == (src + 'sub/deep/c.txt').count_bytes
+    assert usage.apparent == src.size
+    # Symbolic links to files count as their target for `size` only #
+    before = src.size.size
+    os.symlink(src + 'sub/deep/c.txt', src + 'link.txt')
+    target = (src + 'sub/deep/c.txt').count_bytes
+    assert src.size == before + target
+    assert src.disk_usage().apparent == \
+           before + os.lstat(src + 'link.txt').st_size
+    d.remove()
+
+def test_listing():
+    d, src = make_tree()
+    assert len(src) == 3
+    assert 'a.txt' in src and 'nothing' not in src
+    assert src['sub'] == src + 'sub/'
+    assert src['a.txt'] == src + 'a.txt'
+    # Pretend the listing is old enough to be trusted #
+    src.listing().racy = False
+    assert src.listing() is src.listing()
+    assert src.listing().is_current
+    (src + 'new.txt').touch()
+    assert 'new.txt' in src and len(src) == 4
+    (src + 'new.txt').remove()
+    assert 'new.txt' not in src.listing(refresh=True)
+    # Missing directories are empty #
+    missing = DirectoryPath(d + 'missing/')
+    assert len(missing) == 0 and 'x' not in missing
+    try: missing['x']
+    except KeyError: pass
+    else: raise AssertionError
+    d.remove()
+
+def test_snapshots():
+    from autopaths import dir_snapshot
+    d, src = make_tree()
+    state = d + 'state.json.gz'
+    first = src.changes_since(state)
+    assert len(first.added) == 8 and not first.removed and not first.modified
+    assert src.changes_since(state) == (set(), set(), set())
+    # Some changes #
+    (src + 'a.txt').write('changed')
+    (src + 'sub/deep/new.txt').write('new')
+    (src + 'skip/d.txt').remove()
+    changes = src.changes_since(state)
+    assert changes.added == {'sub/deep/new.txt'}
+    assert changes.removed == {'skip/d.txt'}
+    assert changes.modified == {'a.txt'}
+    # Trust the directory mtimes to skip listing them #
+    old = dir_snapshot.Snapshot.load(state)
+    old.taken_at += 10**10
+    (src + 'sub/b.txt').write('in place')
+    fast = src.snapshot(old, fast=True)
+    slow = src.snapshot(old)
+    assert old.diff(fast) == (set(), set(), set())
+    assert old.diff(slow).modified == {'sub/b.txt'}
+    d.remove()
+
+def test_watch():
+    d, src = make_tree()
+    def collect(watcher, timeout=0.5):
+        events = []
+        while True:
+            new = watcher.read(timeout)
+            if not new: return events
+            events += [(e.kind, os.path.relpath(e.path, src)) for e in new]
+    for backend in ('inotify', 'poll'):
+        if backend == 'inotify' and dir_watch.load_inotify() is None: continue
+        (src + 'skip/d.txt').write('d')
+        with src.watch(backend=backend, interval=0.1, settle=0.1) as watcher:
+            (src + 'sub/%s.txt' % backend).write('new')
+            (src + 'a.txt').move_to(src + 'sub/deep/a.txt')
+            (src + 'skip/d.txt').remove()
+            events = collect(watcher)
+        assert ('created', 'sub/%s.txt' % backend) in events
+        assert ('finished', 'sub/%s.txt' % backend) in events
+        assert ('moved', 'a.txt') in events
+        assert ('deleted', 'skip/d.txt') in events
+        (src + 'sub/deep/a.txt').move_to(src + 'a.txt')
+    # Debouncing merges bursts #
+    with src.watch(debounce=0.2) as watcher:
+        for i in range(5): (src + 'burst.txt').write('x' * i)
+        (src + 'temp.txt').write('x')
+        (src + 'temp.txt').remove()
+        events = collect(watcher)
+    assert events == [('created', 'burst.txt'), ('finished', 'burst.txt')]
+    d.remove()
+
+def test_duplicates():
+    d, src = make_tree()
+    other = DirectoryPath(d + 'other/')
+    big = os.urandom(300000)
+    for name in ('big1.bin', 'sub/big2.bin'): (src + name).write(big, mode='wb')
+    (other + 'big3.bin').make_directory()
+    (other + 'big3.bin').write(big, mode='wb')
+    (other + 'near.bin').write(big[:-1] + b'x', mode='wb')
+    (other + 'middle.bin').write(big[:150000] + b'y' + big[150001:],
+                                 mode='wb')
+    (other + 'a_copy.txt').write((src + 'a.txt').contents)
+    groups = src.find_duplicates(other, workers=4)
+    names = [sorted(f.name for f in group) for group in groups]
+    assert names == [['big1.bin', 'big2.bin', 'big3.bin'],
+                     ['a.txt', 'a_copy.txt']]
+    # Files that changed after the comparison are not replaced #
+    from autopaths.duplicates import group_duplicates, replace_duplicates
+    groups = group_duplicates([src, other], workers=4)
+    changed = other + 'a_copy.txt'
+    changed.write('X' * len(changed.contents))
+    os.utime(changed, ns=(0, 0))
+    results = replace_duplicates(groups, dry_run=True)
+    failed = [r for r in results if not r.ok]
+    assert len(failed) == 1 and str(changed) in str(failed[0].error)
+    # Replace them with hard links #
+    changed.write((src + 'a.txt').contents)
+    results = src.deduplicate(other, workers=4)
+    assert len(results) == 3 and all(r.ok for r in results)
+    assert os.stat(src + 'big1.bin').st_nlink == 3
+    assert not src.find_duplicates(other)
+    d.remove()
+
+def test_glob():
+    import re, glob
+    from autopaths.file_path import FilePath
+    d, src = make_tree()
+    (src + '.hidden/f.txt').make_directory()
+    (src + '.hidden/f.txt').write('hidden')
+    names = lambda paths: [os.path.relpath(p, src) for p in paths]
+    assert names(src.glob('*.txt')) == ['a.txt']
+    assert names(src.glob('**/*.txt')) == ['a.txt', 'skip/d.txt',
+                                           'sub/b.txt', 'sub/deep/c.txt']
+    assert names(src.glob('sub/**/*.txt')) == ['sub/b.txt', 'sub/deep/c.txt']
+    assert sorted(src.glob('**/*.txt')) == \
+           sorted(glob.glob(str(src) + '**/*.txt', recursive=True))
+    assert names(src.glob('**/*.txt', exclude=['sub'])) == ['a.txt',
+                                                            'skip/d.txt']
+    assert names(src.glob(re.compile(r'deep/.*\.txt$'))) == ['sub/deep/c.txt']
+    assert names(src.glob({'.gz'})) == ['sub/e.txt.gz']
+    assert names(src.glob('.hidden/*')) == ['.hidden/f.txt']
+    # Finding stops at the first match #
+    matches = src.iglob('**/*.txt')
+    assert next(matches).name == 'a.txt'
+    assert src.find('**/c.txt').name == 'c.txt'
+    try: src.find('*.fastq.gz')
+    except Exception as error: assert 'no paths' in str(error)
+    else: raise AssertionError
+    # Paths with a star #
+    assert FilePath(str(src) + 'sub/deep/*.txt').name == 'c.txt'
+    assert DirectoryPath(str(src) + 'sub/de*') == src + 'sub/deep/'
+    try: FilePath(str(src) + 'sub/*.txt*')
+    except Exception as error: assert 'several' in str(error)
+    else: raise AssertionError
+    d.remove()
+
+def test_remove_empty_dirs():
+    d, src = make_tree()
+    for name in ('e1/e2/e3/', 'e1/e4/', 'mac/', 'sub/deep/empty/'):
+        DirectoryPath(src + name).create(safe=True)
+    (src + 'mac/.DS_Store').write('junk')
+    (src + 'e1/e4/.DS_Store').write('junk')
+    report = src.remove_empty_dirs(dry_run=True)
+    relative = [os.path.relpath(str(p), src) for p in report]
+    assert sorted(relative) == ['e1', 'e1/e2', 'e1/e2/e3', 'e1/e4', 'mac',
+                                'sub/deep/empty']
+    assert relative.index('e1/e2/e3') < relative.index('e1/e2') < \
+           relative.index('e1')
+    assert os.path.exists(src + 'e1/e2/e3/')
+    # A directory that gets a new entry keeps its ignored files too #
+    from autopaths.dir_prune import find_empty_dirs, remove_empty
+    ignored = dict(find_empty_dirs(src))[src + 'mac']
+    (src + 'mac/new.txt').write('new')
+    try: remove_empty(src + 'mac', ignored)
+    except Exception: pass
+    else: raise AssertionError
+    assert os.path.exists(src + 'mac/.DS_Store')
+    (src + 'mac/new.txt').remove()
+    removed = src.remove_empty_dirs(workers=2)
+    assert sorted(removed) == sorted(report)
+    assert not os.path.exists(src + 'e1/') and not os.path.exists(src + 'mac/')
+    assert os.path.exists(src + 'sub/deep/c.txt')
+    assert src.remove_empty_dirs() == []
+    d.remove()
+
 ###############################################################################
 if __name__ == '__main__':
     test_list_files()
-    test_symlink()
\ No newline at end of file
+    test_symlink()
+    test_archives()
+    test_bulk_ops()
+    test_walk()
+    test_parallel_walk()
+    test_disk_usage()
+    test_listing()
+    test_snapshots()
+    test_watch()
+    test_duplicates()
+    test_glob()
+    test_remove_empty_dirs()
@@ -14,7 +14,7 @@ You can run this file like this:
 """
 
 # Built-in modules #
-import os, inspect
+import os, inspect, atexit
 
 # Get the current directory #
 file_name = os.path.abspath((inspect.stack()[0])[1])
@@ -25,6 +25,13 @@ dummy_files = this_dir + 'dummy_file_system/'
 
 # Internal modules #
 from autopaths.dir_path import DirectoryPath
+from autopaths.tmp_path import new_temp_dir
+from autopaths import checksums
+
+# Never write to the checksum cache in the home directory #
+cache_dir = new_temp_dir()
+checksums.default_cache.path = cache_dir + 'checksums.sqlite'
+atexit.register(cache_dir.remove)
 
 ###############################################################################
 def test_symlink():
@@ -32,6 +39,367 @@ def test_symlink():
     one = d['one.txt']
     one.link_to(d + 'one_link.txt')
 
+def test_count():
+    d = new_temp_dir()
+    f = d + 'lines.txt'
+    f.write('a\nb\nc\n' * 1000)
+    assert f.count == 3000
+    assert f.count_lines(workers=4, pool='thread') == 3000
+    assert f.count_lines(workers=3, use_mmap=True, pool='thread') == 3000
+    f.gzip_internal(d + 'lines.txt.gz')
+    assert len(d['lines.txt.gz']) == 3000
+    d.remove()
+
+def test_checksums():
+    import hashlib
+    from autopaths.checksums import ChecksumCache
+    d = new_temp_dir()
+    f = d + 'data.bin'
+    f.write('x' * 100000)
+    cache = ChecksumCache(d + 'cache.sqlite')
+    # A file that was just written could change within the same mtime #
+    f.checksums('md5', cache=cache)
+    assert cache.get(cache.key(f), ['md5']) == {}
+    os.utime(f, (1e9, 1e9))
+    sums = f.checksums('md5', 'sha256', 'blake2', cache=cache)
+    assert sums['md5'] == hashlib.md5(b'x' * 100000).hexdigest()
+    assert sums['sha256'] == hashlib.sha256(b'x' * 100000).hexdigest()
+    assert cache.get(cache.key(f), ['md5', 'sha256', 'blake2']) == sums
+    assert f.checksums('sha1', cache=False, use_mmap=True)['sha1'] == \
+           hashlib.sha1(b'x' * 100000).hexdigest()
+    d.remove()
+
+def test_gzip():
+    import gzip
+    d = new_temp_dir()
+    f = d + 'data.txt'
+    f.write('hello world\n' * 100000)
+    f.gzip_to(d + 'data.txt.gz', method='prll', block_size=10000, workers=3)
+    with gzip.open(d + 'data.txt.gz', 'rt') as handle:
+        assert handle.read() == 'hello world\n' * 100000
+    f = d + 'empty.txt'
+    f.touch()
+    f.gzip_to(False)
+    with gzip.open(f, 'rb') as handle: assert handle.read() == b''
+    # Options for blocks are never dropped silently #
+    f = d + 'data.txt'
+    try: f.gzip_to(d + 'other.txt.gz', method='internal', block_size=10000)
+    except Exception: pass
+    else: raise AssertionError
+    from autopaths.file_path import FilePath
+    original = FilePath.__dict__['fastest_gzip_method']
+    FilePath.fastest_gzip_method = staticmethod(lambda: 'pigz')
+    try: f.gzip_to(d + 'auto.txt.gz', block_size=10000)
+    finally: FilePath.fastest_gzip_method = original
+    assert len((d + 'auto.txt.gz').gzip_index(save=False, span=1).points) > 10
+    d.remove()
+
+def test_gzip_index():
+    d = new_temp_dir()
+    f = d + 'data.txt'
+    f.writelines('line %i\n' % i for i in range(100000))
+    f.gzip_to(d + 'data.txt.gz', block_size=10000)
+    gz = d['data.txt.gz']
+    index = gz.gzip_index(span=50000)
+    assert len(index.points) > 10
+    assert index.total_lines == 100000
+    assert list(gz.tail(3)) == ['line 99997', 'line 99998', 'line 99999']
+    assert list(index.lines(5000, 5002)) == ['line 5000', 'line 5001']
+    assert index.read(len('line 0\n'), 6) == b'line 1'
+    assert gz.gzip_index().points == index.points
+    # A single member file without an index, nothing is written #
+    import gzip
+    from autopaths.gzip_index import GzipIndex
+    single = d + 'single.txt.gz'
+    with gzip.open(single, 'wt') as handle: handle.write(f.contents)
+    assert list(single.tail(2)) == ['line 99998', 'line 99999']
+    assert not os.path.exists(GzipIndex.sidecar_of(single))
+    assert index.tail(100001)[0] == 'line 0'
+    d.remove()
+
+def test_edit():
+    d = new_temp_dir()
+    f = d + 'config.txt'
+    f.write('first\nalpha = 1\n# comment\nlast\n')
+    f.permissions.make_executable()
+    with f.edit() as edit:
+        edit.remove_first_line()
+        edit.replace_word('alpha', 'beta')
+        edit.remove_line('# comment')
+        edit.insert_line(3, 'inserted')
+        edit.prepend('# header\n')
+        edit.append('# footer\n')
+    assert f.contents == '# header\nbeta = 1\ninserted\nlast\n# footer\n'
+    assert f.permissions.is_executable
+    f.sed_replace('b(e)ta', r'g\1ta')
+    f.replace_line('geta = 1', 'gamma = 2')
+    assert f.lines[1] == 'gamma = 2'
+    try: f.replace_line('missing', 'other')
+    except Exception: raised = True
+    else: raised = False
+    assert raised
+    assert f.lines[1] == 'gamma = 2'
+    assert len(d) == 1
+    d.remove()
+
+def test_fast_copy():
+    d = new_temp_dir()
+    a, b, c = d + 'a.txt', d + 'b.txt', d + 'c.txt'
+    a.write('aaa\n')
+    b.write('bbb\n')
+    a.copy(c)
+    assert c.contents == 'aaa\n'
+    c.append(b)
+    c.prepend(b)
+    c.prepend('start\n')
+    assert c.contents == 'start\nbbb\naaa\nbbb\n'
+    merged = (d + 'sub/merged.txt').concat_from([a, b, a])
+    assert merged.contents == 'aaa\nbbb\naaa\n'
+    # Sparse files keep their holes and their size #
+    sparse = d + 'sparse.bin'
+    with open(sparse, 'wb') as handle:
+        handle.write(b'x')
+        handle.seek(1 << 24)
+        handle.write(b'y')
+        handle.truncate(1 << 25)
+    sparse.copy(d + 'sparse_copy.bin')
+    with open(d + 'sparse_copy.bin', 'rb') as handle: data = handle.read()
+    assert len(data) == 1 << 25
+    assert data[0:1] == b'x' and data[1 << 24:(1 << 24) + 1] == b'y'
+    assert data.count(b'\0') == (1 << 25) - 2
+    # Copying a file onto itself must not truncate it #
+    import shutil
+    os.link(a, d + 'a_link.txt')
+    for target in (a, d + 'a_link.txt', a.directory):
+        try: a.copy(target)
+        except shutil.SameFileError: pass
+        else: raise AssertionError
+    try: c.concat_from([a, c])
+    except shutil.SameFileError: pass
+    else: raise AssertionError
+    assert a.contents == 'aaa\n'
+    assert c.contents == 'start\nbbb\naaa\nbbb\n'
+    d.remove()
+
+def test_line_view():
+    from autopaths.line_view import LineIndex
+    d = new_temp_dir()
+    f = d + 'data.txt'
+    f.writelines('line %i\n' % i for i in range(1000))
+    with f.line_view(save=True) as view:
+        assert len(view) == 1000
+        assert view[0] == 'line 0' and view[-1] == 'line 999'
+        assert view[10:13] == ['line 10', 'line 11', 'line 12']
+        assert next(reversed(view)) == 'line 999'
+    assert LineIndex.load(f).offsets == view.offsets
+    scanned = [o for chunk in LineIndex.scan(f, window=7) for o in chunk]
+    assert scanned == list(LineIndex.build(f).offsets)
+    f.append('no newline')
+    assert LineIndex.load(f) is None
+    with f.line_view() as view: assert view[1000] == 'no newline'
+    d.remove()
+
+def test_shards():
+    from autopaths.file_shards import fastq_record_start
+    d = new_temp_dir()
+    f = d + 'reads.fastq'
+    f.writelines('@read%i\nACGT\n+\n@@@@\n' % i for i in range(5000))
+    ranges = f.shard_ranges(4, fastq_record_start)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == f.count_bytes
+    shards = f.split_to(d + 'shards/', 4, fastq_record_start)
+    assert [s.name for s in shards][0] == 'reads.part000.fastq'
+    assert all(s.first.startswith('@read') for s in shards)
+    assert sum(s.count for s in shards) == 20000
+    d.remove()
+
+def test_sniff():
+    d = new_temp_dir()
+    text = d + 'text.txt'
+    text.write('héllo wörld\n' * 10000, encoding='utf-8')
+    assert not text.contains_binary
+    assert text.sniff().encoding == 'utf-8'
+    binary = d + 'binary.bin'
+    with open(binary, 'wb') as handle: handle.write(bytes(range(256)) * 100)
+    assert binary.contains_binary
+    text.gzip_to(d + 'text.txt.gz')
+    assert d['text.txt.gz'].sniff() == (True, None, 'gzip')
+    assert d['text.txt.gz'].compression == 'gzip'
+    # Files that were just written are not cached #
+    from autopaths import sniff
+    sniff.cache.clear()
+    binary.sniff()
+    assert not sniff.cache
+    os.utime(binary, (1e9, 1e9))
+    binary.sniff()
+    assert len(sniff.cache) == 1
+    d.remove()
+
+def test_compressed_io():
+    import bz2, lzma
+    d = new_temp_dir()
+    text = ''.join('line %i\n' % i for i in range(10000))
+    for name, module in (('a.bz2', bz2), ('a.xz', lzma)):
+        with open(d + name, 'wb') as handle:
+            handle.write(module.compress(text[:500].encode()))
+            handle.write(module.compress(text[500:].encode()))
+    (d + 'a.txt').write(text)
+    d['a.txt'].gzip_to(d + 'a.gz', block_size=1000)
+    for name in ('a.txt', 'a.gz', 'a.bz2', 'a.xz'):
+        f = d[name]
+        assert f.first == 'line 0\n'
+        assert f.contents == text
+        assert f.lines[-1] == 'line 9999'
+        assert list(f.head(2)) == ['line 0\n', 'line 1\n']
+        assert len(f) == 10000
+        with f as handle: assert handle.readline() == 'line 0\n'
+    d.remove()
+
+def test_compression():
+    d = new_temp_dir()
+    f = d + 'a.txt'
+    f.writelines('line %i\n' % i for i in range(50000))
+    for fmt in ('gzip', 'bz2', 'xz', 'zip'):
+        compressed = f.compress_to(format=fmt, workers=2, chunk_size=100000)
+        assert compressed.compression == fmt
+        result = compressed.decompress_to(d + 'result.txt')
+        assert result.md5 == f.md5
+        compressed.remove()
+    d.remove()
+
+def test_extract():
+    import tarfile, zipfile
+    d = new_temp_dir()
+    src = d + 'src/'
+    for name in ('a.txt', 'sub/b.txt', 'sub/c.fastq'):
+        (src + name).make_directory()
+        (src + name).write(name[-3:] * 3)
+    # Zip #
+    z = src.zip_to(d + 'src.zip')
+    out = z.unzip_to(single=False, workers=2)
+    assert (out + 'sub/b.txt').contents == 'txttxttxt'
+    out = z.unzip_to(d + 'sel/', single=False, select=['*.fastq'])
+    assert list(out.files) == [out + 'sub/c.fastq']
+    # Tar #
+    t = src.targz_to(d + 'src.tar.gz')
+    out = t.untargz_to()
+    assert (out + 'sub/b.txt').contents == 'txttxttxt'
+    out = t.untargz_to(d + 'sel_tar/', select=['sub', 'sub/b.txt'])
+    assert [f.name for f in out.files] == ['b.txt']
+    # A selected hard link to a member that was not selected #
+    linked = d + 'linked.tar'
+    with tarfile.open(str(linked), 'w') as handle:
+        handle.add(src + 'a.txt', 'data/a.txt')
+        for name in ('keep/one.txt', 'keep/two.txt'):
+            info = tarfile.TarInfo(name)
+            info.type, info.linkname = tarfile.LNKTYPE, 'data/a.txt'
+            handle.addfile(info)
+    out = linked.untar_to(d + 'linked/', select=['keep/*'])
+    assert sorted(f.name for f in out.files) == ['one.txt', 'two.txt']
+    assert (out + 'keep/two.txt').contents == 'txttxttxt'
+    assert not os.path.exists(out + 'data/a.txt')
+    # Unsafe members #
+    evil = d + 'evil.zip'
+    with zipfile.ZipFile(evil, 'w') as handle: handle.writestr('../x', 'x')
+    try: evil.unzip_to(d + 'evil/', single=False)
+    except Exception: pass
+    else: raise AssertionError
+    evil = d + 'evil.tar'
+    with tarfile.open(str(evil), 'w') as handle:
+        info = tarfile.TarInfo('link')
+        info.type, info.linkname = tarfile.SYMTYPE, '../..'
+        handle.addfile(info)
+    try: evil.untar_to(d + 'evil_tar/')
+    except Exception: pass
+    else: raise AssertionError
+    assert not os.path.exists(d + 'x')
+    # Links through links, resolving to the parent of the destination #
+    evil  = d + 'chain.tar'
+    inner = d + 'inner/'
+    inner.create()
+    before = os.stat(inner).st_mode
+    with tarfile.open(str(evil), 'w') as handle:
+        for name, kind, target in (('s', tarfile.DIRTYPE, ''),
+                                   ('s/l', tarfile.SYMTYPE, '..'),
+                                   ('s/l/esc', tarfile.SYMTYPE, '..'),
+                                   ('esc', tarfile.DIRTYPE, '')):
+            info = tarfile.TarInfo(name)
+            info.type, info.linkname, info.mode = kind, target, 0o777
+            handle.addfile(info)
+    try: evil.untar_to(inner + 'dest/')
+    except Exception: pass
+    else: raise AssertionError
+    assert not os.path.islink(inner + 'dest/esc')
+    assert os.stat(inner).st_mode == before
+    d.remove()
+
+def test_archive_members():
+    d = new_temp_dir()
+    src = d + 'src/'
+    for name in ('meta.txt', 'data/b.txt', 'data/c.txt'):
+        (src + name).make_directory()
+        (src + name).write('contents of %s\n' % name * 1000)
+    archives = [src.zip_to(d + 'a.zip'), src.tar_to(d + 'a.tar'),
+                src.targz_to(d + 'a.tar.gz'), src.targz_to(d + 'b.tar.gz')]
+    archives[3].gzip_index()
+    # Without a cached table of contents, only read up to the member #
+    from autopaths import archive_members
+    for archive in archives[1:]:
+        archive_members.cache.clear()
+        with archive.open_member('data/b.txt') as handle:
+            assert handle.read() == b'contents of data/b.txt\n' * 1000
+        assert not archive_members.cache
+        try: archive.open_member('missing.txt')
+        except Exception as error: assert 'No member' in str(error)
+        else: raise AssertionError
+    # Archives that were just written are not cached #
+    assert archives[2].archive_contents and not archive_members.cache
+    os.utime(archives[2], (1e9, 1e9))
+    assert archives[2].archive_contents and len(archive_members.cache) == 1
+    for archive in archives:
+        assert archive.tar_top_dirs == ['data', 'meta.txt']
+        sizes = {i.name: i.size for i in archive.archive_contents}
+        assert sizes['data/c.txt'] == 23000
+        with archive.open_member('data/b.txt', 'r') as handle:
+            assert handle.read() == 'contents of data/b.txt\n' * 1000
+        members = archive.iter_archive_members(select=['meta.txt'])
+        assert [(i.name, h.read(8)) for i, h in members] == \
+               [('meta.txt', b'contents')]
+    d.remove()
+
+def test_aio():
+    import asyncio
+    from autopaths import aio
+    d = new_temp_dir()
+    files = [d + ('sub/%i.txt' % i) for i in range(50)]
+    async def main():
+        await (d + 'sub/').aio.create_if_not_exists()
+        await asyncio.gather(*(f.aio.write('%s\n' % f.name) for f in files))
+        digests = await asyncio.gather(*(f.aio.md5() for f in files))
+        assert digests == [f.md5 for f in files]
+        assert await files[0].aio.contents() == '0.txt\n'
+        copy = d + 'copy.txt'
+        await files[1].aio.copy(copy)
+        assert await copy.aio.exists()
+        return [f async for f in d.aio.files(batch_size=7)]
+    aio.configure(workers=4, pending=8)
+    assert len(asyncio.run(main())) == 51
+    d.remove()
+
 ###############################################################################
 if __name__ == '__main__':
-    test_symlink()
\ No newline at end of file
+    test_symlink()
+    test_count()
+    test_checksums()
+    test_gzip()
+    test_gzip_index()
+    test_edit()
+    test_fast_copy()
+    test_line_view()
+    test_shards()
+    test_sniff()
+    test_compressed_io()
+    test_compression()
+    test_extract()
+    test_archive_members()
+    test_aio()